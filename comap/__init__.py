@@ -1,3 +1,35 @@
 """ comap package for python
+
+The modules are imported on the first access (`comap.api`, `comap.api_async`...),
+so `import comap` does not import `requests` or `aiohttp`.
 """
+import importlib
+
 NAME = "comap"
+
+_MODULES = (
+    "api",
+    "api_async",
+    "api_facade",
+    "arrays",
+    "benchmark",
+    "cache",
+    "constants",
+    "decode",
+    "metrics",
+    "mock",
+    "models",
+    "retry",
+    "store",
+)
+
+
+def __getattr__(name: str):
+    """Import the module on the first access"""
+    if name in _MODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_MODULES))
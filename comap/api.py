@@ -5,20 +5,51 @@ The instructions for testing and examples are available on ComAp-API repository.
 
 There are two modules available - a simpler synchronous module `comap.api` and asynchronous module `comap.api_async`. The async module is recommended for use in production.
 
-This module contains two classes:
+This module contains these classes:
 
-- Identity - serves to authenticate to ComAp Cloud and obtain the token
-             used in the individual APIs.
-- WSV      - set of APIs to communicate with the WebSupervisor PRO
+- Identity      - serves to authenticate to ComAp Cloud and obtain the token
+                  used in the individual APIs.
+- TokenProvider - keeps the token obtained from Identity up to date
+- WSV           - set of APIs to communicate with the WebSupervisor PRO
+- RateLimiter   - limits the request rate, can be shared by multiple instances
 
 """
+from __future__ import annotations
+
 import logging
 import os
-from datetime import datetime
-
-import requests
-
-from .constants import AUTHORIZATION, COMAP_KEY, IDENTITY_URL, TIMEOUT, WSV_URL
+import threading
+import time
+from collections.abc import Iterator
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .cache import NameIndex, ResponseCache, TTLCache
+from .constants import (
+    AUTHORIZATION,
+    CACHE_SIZE,
+    CACHE_TTL,
+    CHUNK_SIZE,
+    COMAP_KEY,
+    CONCURRENCY,
+    DATE_FORMAT,
+    IDENTITY_URL,
+    POOL_CONNECTIONS,
+    POOL_MAXSIZE,
+    RATE_LIMIT,
+    TIMEOUT,
+    TOKEN_REFRESH_MARGIN,
+    WSV_URL,
+)
+from .decode import loads, parse_dates
+from .metrics import Metrics
+from .models import Comment, FileInfo, Unit, Value, ValueHistory, decode_models
+from .retry import RetryPolicy, parse_retry_after
+
+if TYPE_CHECKING:
+    import requests
+
+    from .store import HistoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,10 +64,151 @@ class ErrorGettingData(Exception):
         return repr(self.value)
 
 
+def _complete(response, size: int) -> bool:
+    """Is the partial download of `size` bytes complete, by the 'Content-Range'
+    of the 416 (range not satisfiable) response ('bytes */<total size>')"""
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return total == str(size)
+
+
+def create_session(
+    pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE
+) -> requests.Session:
+    """Create HTTPS connection pool with keep-alive
+
+    The session can be shared by several `Identity` and `WSV` instances.
+    The caller then owns the session and is responsible for closing it.
+
+    Parameters:
+    -----------
+    pool_connections: `int`, optional
+        number of hosts to keep connection pools for
+    pool_maxsize: `int`, optional
+        maximum number of connections kept open to one host
+
+    Returns:
+    --------
+    `requests.Session`
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class RateLimiter:
+    """Token bucket rate limiter with adaptive concurrency
+
+    Limits the request rate and the number of requests in flight. The number of
+    requests in flight is halved when the API responds with 429 (too many requests)
+    or 5xx, and slowly grows back with successful responses.
+    The `Retry-After` header pauses all requests. Can be shared by multiple
+    `Identity` and `WSV` instances (also used from multiple threads).
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: int | None = None,
+        max_concurrency: int = CONCURRENCY,
+        min_concurrency: int = 1,
+    ) -> None:
+        """Setup of the rate limiter
+
+        Parameters:
+        -----------
+        rate: `float`, optional
+            requests per second
+        burst: `int`, optional
+            number of requests that can be sent at once (defaults to `rate`)
+        max_concurrency: `int`, optional
+            maximum number of requests in flight
+        min_concurrency: `int`, optional
+            the number of requests in flight is never reduced below this
+        """
+        self._rate = rate
+        self._burst = max(1, int(rate)) if burst is None else burst
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._min_concurrency = min_concurrency
+        self._max_concurrency = max_concurrency
+        self._concurrency = float(max_concurrency)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        """Current limit of requests in flight"""
+        return int(self._concurrency)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests in flight"""
+        return self._in_flight
+
+    def acquire(self) -> None:
+        """Wait for a free slot and a token"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            delay = max(-self._tokens / self._rate, self._paused_until - now)
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(
+        self, status: int | None = None, retry_after: str | None = None
+    ) -> None:
+        """Free the slot and adapt the concurrency to the response status
+
+        Parameters:
+        -----------
+        status: `int`, optional
+            HTTP status of the response (`None` if there was no response)
+        retry_after: `str`, optional
+            value of the `Retry-After` response header
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if status == 429 or (status is not None and status >= 500):
+                self._concurrency = max(self._min_concurrency, self._concurrency / 2)
+                _LOGGER.debug("Concurrency reduced to %s", self.concurrency)
+            elif status is not None and status < 400:
+                self._concurrency = min(
+                    self._max_concurrency, self._concurrency + 1 / self._concurrency
+                )
+            if retry_after is not None:
+                self._paused_until = max(
+                    self._paused_until,
+                    time.monotonic() + parse_retry_after(retry_after),
+                )
+            self._condition.notify_all()
+
+
 class ComApCloud:
     """The base class for both APIs"""
 
-    def __init__(self, headers: dict, login_id: str = None) -> None:
+    def __init__(
+        self,
+        headers: dict,
+        login_id: str = None,
+        session: requests.Session | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
         """Create ComAp Cloud API instance
 
         Parameters:
@@ -45,9 +217,36 @@ class ComApCloud:
             Contain ComAp Key, and for WSV API Authorization (Bearer token)
         login_id: `str`, optional
             the user name (each identity can have multiple user names)
+        session: `requests.Session`, optional
+            HTTPS connection pool shared with other instances (see `create_session`).
+            If not specified, the instance creates and owns its own pool.
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
         """
         self._headers = headers
         self._login_id = login_id
+        self._token_provider = None
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy
+        self._metrics = metrics
+        self._response_cache = None
+        self._owns_session = session is None
+        self._session = create_session() if session is None else session
+
+    def close(self) -> None:
+        """Close the connection pool (unless it was shared by the caller)"""
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def get_api(
         self,
@@ -56,6 +255,8 @@ class ComApCloud:
         unit_guid: str | None = None,
         file_name: str | None = None,
         payload: dict | None = None,
+        headers: dict | None = None,
+        stream: bool = False,
     ) -> requests.Response | None:
         """Call ComAp GET API.
 
@@ -71,6 +272,12 @@ class ComApCloud:
             for WSV download API - file name
         payload: `dict`, optional
             some APIs require a payload
+        headers: `dict`, optional
+            additional request headers
+        stream: `bool`, optional
+            do not download the response body until it is accessed (the request
+            is not reported to the `metrics` hooks, the caller reports it with
+            the size read, as `download` does)
 
         Returns:
         --------
@@ -83,23 +290,76 @@ class ComApCloud:
             login_id=self._login_id, unit_guid=unit_guid, file_name=file_name
         )
         _body = {} if payload is None else payload
-        try:
-            response = requests.get(
-                _url, headers=self._headers, params=_body, timeout=TIMEOUT
+        return self._request(
+            "GET",
+            api,
+            _url,
+            headers=headers,
+            unit_guid=unit_guid,
+            params=_body,
+            stream=stream,
+        )
+
+    def get_document(
+        self,
+        application: dict,
+        api: str,
+        unit_guid: str | None = None,
+        payload: dict | None = None,
+    ) -> bytes | None:
+        """Call ComAp GET API and return the response body, using the response cache
+
+        The cached APIs are called with the validators of the cached response
+        ('If-None-Match', 'If-Modified-Since'), the cached body is returned
+        if the API responds 304 (not modified).
+
+        Parameters are the same as for `get_api`.
+
+        Returns:
+        --------
+        `bytes` or `None` if not succesfull
+        """
+        cache = self._response_cache
+        if cache is None or api not in cache.apis:
+            response = self.get_api(
+                application=application, api=api, unit_guid=unit_guid, payload=payload
             )
-        except requests.exceptions.Timeout:
-            _LOGGER.error("API GET '%s' response time-out.", api)
+            return None if response is None else response.content
+        key = cache.key(
+            application.get(api),
+            self._login_id,
+            unit_guid,
+            None if payload is None else sorted(payload.items()),
+        )
+        body, validators = cache.lookup(key)
+        if body is not None:
+            return body
+        response = self.get_api(
+            application=application,
+            api=api,
+            unit_guid=unit_guid,
+            payload=payload,
+            headers=validators or None,
+        )
+        if response is None:
             return None
-        _LOGGER.debug("Calling GET API %s", response.url)
-        if response.status_code != 200:
-            _LOGGER.error(
-                "API GET '%s' returned code: %s (%s) ",
-                api,
-                response.status_code,
-                response.reason,
+        if response.status_code == 304:
+            body = cache.not_modified(key)
+            if body is not None:
+                return body
+            # evicted meanwhile, download it again
+            response = self.get_api(
+                application=application, api=api, unit_guid=unit_guid, payload=payload
             )
-            return None
-        return response
+            if response is None:
+                return None
+        cache.store(
+            key,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        return response.content
 
     def post_api(
         self,
@@ -107,6 +367,7 @@ class ComApCloud:
         api: str,
         unit_guid: str | None = None,
         payload: dict | None = None,
+        retry: bool = False,
     ) -> requests.Response | None:
         """Call ComAp POST API.
 
@@ -120,6 +381,8 @@ class ComApCloud:
             for WSV API - the genset ID (from the `units` API, or in WSV application front-end)
         payload: `dict`, optional
             some APIs require a payload
+        retry: `bool`, optional
+            the call is idempotent and can be repeated according to the retry policy
 
         Returns:
         --------
@@ -130,37 +393,222 @@ class ComApCloud:
             return None
         _url = application[api].format(login_id=self._login_id, unit_guid=unit_guid)
         _body = {} if payload is None else payload
+        return self._request(
+            "POST", api, _url, retry=retry, unit_guid=unit_guid, json=_body
+        )
+
+    def _request(
+        self,
+        method: str,
+        api: str,
+        url: str,
+        headers: dict | None = None,
+        retry: bool = True,
+        unit_guid: str | None = None,
+        **kwargs,
+    ) -> requests.Response | None:
+        """Send the request, report it to the metrics hooks with the size of the body"""
+        if self._metrics is None:
+            response, _, _ = self._attempts(method, api, url, headers, retry, **kwargs)
+            return response
+        context = self._metrics.on_request_start(method, api, unit_guid)
+        started = time.perf_counter()
+        response = status = None
+        retries = 0
         try:
-            response = requests.post(
-                _url, headers=self._headers, json=_body, timeout=TIMEOUT
+            response, status, retries = self._attempts(
+                method, api, url, headers, retry, **kwargs
             )
-        except requests.exceptions.Timeout:
-            _LOGGER.error("API POST '%s' response time-out", api)
-            return None
-        _LOGGER.debug("Calling POST API %s", response.url)
-        if response.status_code != 200:
-            _LOGGER.error(
-                "API POST '%s' returned code: %s (%s)",
-                api,
-                response.status_code,
-                response.reason,
+            return response
+        finally:
+            report = (context, method, api, unit_guid, status, started, retries)
+            if response is not None and kwargs.get("stream"):
+                # the body is not read yet, reported by `_report_stream`
+                response._comap_report = report
+            else:
+                self._report(
+                    report, None if response is None else len(response.content)
+                )
+
+    def _report(self, report: tuple, size: int | None) -> None:
+        """Call the metrics hook at the end of the request"""
+        context, method, api, unit_guid, status, started, retries = report
+        self._metrics.on_request_end(
+            context,
+            method,
+            api,
+            unit_guid,
+            status,
+            size,
+            time.perf_counter() - started,
+            retries,
+        )
+
+    def _report_stream(self, response: requests.Response, size: int) -> None:
+        """Report the streamed request when its body was read (`size` bytes)"""
+        report = getattr(response, "_comap_report", None)
+        if report is not None:
+            del response._comap_report
+            self._report(report, size)
+
+    def _attempts(
+        self,
+        method: str,
+        api: str,
+        url: str,
+        headers: dict | None,
+        retry: bool,
+        **kwargs,
+    ) -> tuple:
+        """Send the request, repeat it on transient errors or with a new token
+
+        Return the response (`None` if not succesfull), the last status and the
+        number of retries.
+        """
+        import requests
+
+        refreshed = False
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            token = (
+                None if self._token_provider is None else self._token_provider.token()
             )
+            _headers = {**self._headers, **(headers or {})}
+            if token is not None:
+                _headers[AUTHORIZATION] = "Bearer " + token
+            try:
+                response = self._send(
+                    method, url, headers=_headers, timeout=TIMEOUT, **kwargs
+                )
+            except (
+                requests.exceptions.Timeout,
+                requests.exceptions.ConnectionError,
+            ) as e:
+                delay = self._retry_delay(retry, api, None, attempt, started)
+                if delay is not None:
+                    _LOGGER.debug(
+                        "API %s '%s' error %s, retrying in %.1f s",
+                        method,
+                        api,
+                        e,
+                        delay,
+                    )
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                if isinstance(e, requests.exceptions.Timeout):
+                    _LOGGER.error("API %s '%s' response time-out.", method, api)
+                    return None, None, attempt
+                raise
+            _LOGGER.debug("Calling %s API %s", method, response.url)
+            if (
+                response.status_code == 401
+                and self._token_provider is not None
+                and not refreshed
+            ):
+                response.close()
+                self._token_provider.refresh(stale_token=token)
+                refreshed = True
+                continue
+            # 416 answers a resumed download with nothing left (see `download`)
+            if response.status_code not in (200, 206, 304) and not (
+                response.status_code == 416 and "Range" in _headers
+            ):
+                delay = self._retry_delay(
+                    retry,
+                    api,
+                    response.status_code,
+                    attempt,
+                    started,
+                    response.headers.get("Retry-After"),
+                )
+                if delay is not None:
+                    _LOGGER.debug(
+                        "API %s '%s' returned code: %s, retrying in %.1f s",
+                        method,
+                        api,
+                        response.status_code,
+                        delay,
+                    )
+                    response.close()
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                _LOGGER.error(
+                    "API %s '%s' returned code: %s (%s)",
+                    method,
+                    api,
+                    response.status_code,
+                    response.reason,
+                )
+                return None, response.status_code, attempt
+            return response, response.status_code, attempt
+
+    def _retry_delay(
+        self,
+        retry: bool,
+        api: str,
+        status: int | None,
+        attempt: int,
+        started: float,
+        retry_after: str | None = None,
+    ) -> float | None:
+        """Delay before repeating the failed request, `None` if not repeated"""
+        if not retry or self._retry_policy is None:
             return None
-        return response
+        return self._retry_policy.retry_delay(
+            api, status, attempt, started, retry_after
+        )
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send one request, respecting the rate limiter"""
+        if self._rate_limiter is None:
+            return self._session.request(method, url, **kwargs)
+        self._rate_limiter.acquire()
+        status = retry_after = None
+        try:
+            response = self._session.request(method, url, **kwargs)
+            status = response.status_code
+            retry_after = response.headers.get("Retry-After")
+            return response
+        finally:
+            self._rate_limiter.release(status, retry_after)
 
 
 class Identity(ComApCloud):
     """ComAp Cloud Identity API wrapper"""
 
-    def __init__(self, key: str) -> None:
+    def __init__(
+        self,
+        key: str,
+        session: requests.Session | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
         """Setup of the ComAp Cloud Identity API class
 
         Parameters:
         ----------
         key: `str`
             ComAp Key (from the API profile)
+        session: `requests.Session`, optional
+            shared HTTPS connection pool (see `create_session`)
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
         """
-        super().__init__(headers={"Content-Type": "application/json", COMAP_KEY: key})
+        super().__init__(
+            headers={"Content-Type": "application/json", COMAP_KEY: key},
+            session=session,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            metrics=metrics,
+        )
 
     def authenticate(self, client_id: str, secret: str) -> dict | None:
         """Authenticate and return bearer token dictionary.
@@ -186,15 +634,94 @@ class Identity(ComApCloud):
         """
         body = {"clientId": client_id, "secret": secret}
         response = self.post_api(
-            application=IDENTITY_URL, api="authenticate", payload=body
+            application=IDENTITY_URL, api="authenticate", payload=body, retry=True
         )
-        return None if response is None else response.json()
+        return None if response is None else loads(response.content)
+
+
+class TokenProvider:
+    """Obtain the Bearer token from the Identity API and refresh it before it expires"""
+
+    def __init__(
+        self,
+        identity: Identity,
+        client_id: str,
+        secret: str,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+    ) -> None:
+        """Setup of the token provider
+
+        Parameters:
+        -----------
+        identity: `Identity`
+            ComAp Cloud Identity API instance
+        client_id: `str`
+            see `Identity.authenticate`
+        secret: `str`
+            see `Identity.authenticate`
+        refresh_margin: `float`, optional
+            refresh the token this many seconds before it expires
+        """
+        self._identity = identity
+        self._client_id = client_id
+        self._secret = secret
+        self._refresh_margin = refresh_margin
+        self._token = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def token(self) -> str | None:
+        """Return the current token, refresh it if it is about to expire
+
+        Returns:
+        --------
+        Bearer access token (`str`) or `None` if the authentication failed
+        """
+        if time.monotonic() >= self._expires - self._refresh_margin:
+            return self.refresh(stale_token=self._token)
+        return self._token
+
+    def refresh(self, stale_token: str | None = None) -> str | None:
+        """Authenticate and return the new token
+
+        Parameters:
+        -----------
+        stale_token: `str`, optional
+            the token that was rejected - if another thread has already replaced it,
+            the new token is returned without authenticating again
+
+        Returns:
+        --------
+        Bearer access token (`str`) or `None` if the authentication failed
+        """
+        with self._lock:
+            if self._token is not None and self._token != stale_token:
+                return self._token
+            token = self._identity.authenticate(self._client_id, self._secret)
+            if token is None:
+                return self._token
+            self._token = token["access_token"]
+            self._expires = time.monotonic() + float(token["expires_in"])
+            return self._token
 
 
 class WSV(ComApCloud):
     """ComAp Cloud WSV API wrapper"""
 
-    def __init__(self, login_id: str, key: str, token: str) -> None:
+    def __init__(
+        self,
+        login_id: str,
+        key: str,
+        token: str | TokenProvider,
+        session: requests.Session | None = None,
+        cache_ttl: float = CACHE_TTL,
+        cache_size: int = CACHE_SIZE,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+        parse_dates: bool = True,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
         """Setup of the ComAp Cloud WSV API class
 
         Parameters:
@@ -203,21 +730,53 @@ class WSV(ComApCloud):
             the user name (each identity can have multiple user names)
         key: `str`
             ComAp Key (from the API profile)
-        token: `str`
-            The Bearer token received from Identity API authenticate
+        token: `str` or `TokenProvider`
+            The Bearer token received from Identity API authenticate,
+            or the provider refreshing the token before it expires
+        session: `requests.Session`, optional
+            shared HTTPS connection pool (see `create_session`)
+        cache_ttl: `float`, optional
+            time (in seconds) to cache the units and value catalogs used to find GUIDs by name
+        cache_size: `int`, optional
+            maximum number of cached units and value catalogs
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
+        parse_dates: `bool`, optional
+            convert the timestamps in the results to `datetime`. If disabled,
+            the timestamps are kept as ISO 8601 strings (faster)
+        response_cache: `ResponseCache`, optional
+            cache of the metadata responses (units, info, files, comments)
+            validated by ETag / Last-Modified (can be shared with other instances)
         """
+        headers = {"Content-Type": "application/json", COMAP_KEY: key}
+        if isinstance(token, str):
+            headers[AUTHORIZATION] = "Bearer " + token
         super().__init__(
-            headers={
-                "Content-Type": "application/json",
-                COMAP_KEY: key,
-                AUTHORIZATION: "Bearer " + token,
-            },
+            headers=headers,
             login_id=login_id,
+            session=session,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            metrics=metrics,
         )
+        if isinstance(token, TokenProvider):
+            self._token_provider = token
+        self._cache = TTLCache(cache_ttl, cache_size)
+        self._parse_dates = parse_dates
+        self._response_cache = response_cache
 
-    def units(self) -> list:
+    def units(self, as_models: bool = False) -> list:
         """Get list of all units
 
+        Parameters:
+        -----------
+        as_models: bool, optional
+            return `Unit` models instead of `dict` (see `comap.models`)
+
         Returns:
         --------
         `list` of `dict`
@@ -227,10 +786,14 @@ class WSV(ComApCloud):
             'url': `str`
         }]
         """
-        response = self.get_api(application=WSV_URL, api="units")
-        return [] if response is None else response.json()["units"]
+        document = self.get_document(application=WSV_URL, api="units")
+        if as_models:
+            return self._models(document, "units", Unit)
+        return [] if document is None else loads(document)["units"]
 
-    def values(self, unit_guid: str, value_guids: str | None = None) -> list:
+    def values(
+        self, unit_guid: str, value_guids: str | None = None, as_models: bool = False
+    ) -> list:
         """Get Genset values
 
         Parameters:
@@ -240,6 +803,8 @@ class WSV(ComApCloud):
         value_guids: str, optional
             list of the value guids separated by comma
             (get it by calling this function with no parameter or `get_value_guid`)
+        as_models: bool, optional
+            return `Value` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
@@ -266,9 +831,13 @@ class WSV(ComApCloud):
                 unit_guid=unit_guid,
                 payload={"valueGuids": value_guids},
             )
-        values = [] if response is None else response.json()["values"]
-        for value in values:
-            value["timeStamp"] = datetime.fromisoformat(value["timeStamp"])
+        if as_models:
+            return self._models(
+                None if response is None else response.content, "values", Value
+            )
+        values = [] if response is None else loads(response.content)["values"]
+        if self._parse_dates:
+            parse_dates(values, "timeStamp")
         return values
 
     def info(self, unit_guid: str) -> dict:
@@ -300,16 +869,20 @@ class WSV(ComApCloud):
             'longitude': `number`}
         }
         """
-        response = self.get_api(application=WSV_URL, api="info", unit_guid=unit_guid)
-        return {} if response is None else response.json()
+        document = self.get_document(
+            application=WSV_URL, api="info", unit_guid=unit_guid
+        )
+        return {} if document is None else loads(document)
 
-    def comments(self, unit_guid: str) -> list:
+    def comments(self, unit_guid: str, as_models: bool = False) -> list:
         """Get Genset comments
 
         Parameters:
         -----------
         unit_guid: str
             the genset ID (from the `units` API, or in WSV application front-end)
+        as_models: bool, optional
+            return `Comment` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
@@ -322,12 +895,14 @@ class WSV(ComApCloud):
             "active": `Boolean`
         }]
         """
-        response = self.get_api(
+        document = self.get_document(
             application=WSV_URL, api="comments", unit_guid=unit_guid
         )
-        comments = [] if response is None else response.json()["comments"]
-        for comment in comments:
-            comment["date"] = datetime.fromisoformat(comment["date"])
+        if as_models:
+            return self._models(document, "comments", Comment)
+        comments = [] if document is None else loads(document)["comments"]
+        if self._parse_dates:
+            parse_dates(comments, "date")
         return comments
 
     def history(
@@ -336,7 +911,9 @@ class WSV(ComApCloud):
         _from: str | None = None,
         _to: str | None = None,
         value_guids: str | None = None,
-    ) -> list:
+        as_arrays: bool = False,
+        as_models: bool = False,
+    ) -> list | dict:
         """Get Genset history
 
         Parameters:
@@ -350,15 +927,65 @@ class WSV(ComApCloud):
         value_guids: `list`, optional
             list of the value guids separated by comma
             (get it by calling `values` or `get_value_guid`)
+        as_arrays: `bool`, optional
+            return NumPy arrays per value GUID (requires `numpy`)
+        as_models: `bool`, optional
+            return pages of `ValueHistory` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
-        `list` of `dict`
+        `list` of pages (see `iter_history`),
+        or `dict` of arrays by valueGuid if `as_arrays` (see `comap.arrays.HistoryArrays`)
+        """
+        if as_arrays:
+            from .arrays import HistoryArrays
+
+            arrays = HistoryArrays()
+            for values in self._history_pages(unit_guid, _from, _to, value_guids):
+                arrays.add_page(values)
+            return arrays.result()
+        return list(self.iter_history(unit_guid, _from, _to, value_guids, as_models))
+
+    def iter_history(
+        self,
+        unit_guid: str,
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+        as_models: bool = False,
+    ) -> Iterator[list]:
+        """Get Genset history page by page
+
+        Only one page is kept in memory. Parameters are the same as for `history`.
+
+        Yields:
+        -------
+        page - `list` of `dict`
         [{
-            'value': `str`,
-            'validFrom': `datetime`,
-            'validTo': `datetime`
+            'valueGuid': `str`,
+            'history': [{
+                'value': `str`,
+                'validFrom': `datetime`,
+                'validTo': `datetime`
+            }]
         }]
+        or `list` of `ValueHistory` if `as_models`
+        """
+        pages = self._history_pages(unit_guid, _from, _to, value_guids, as_models)
+        for values in pages:
+            yield values if as_models else self._parse_history(values)
+
+    def _history_pages(
+        self,
+        unit_guid: str,
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+        as_models: bool = False,
+    ) -> Iterator[list]:
+        """Yield the 'values' of the history API responses, following nextOffset
+
+        The values are decoded as `ValueHistory` models if `as_models`.
         """
         payload = {}
         if _from is not None:
@@ -367,33 +994,86 @@ class WSV(ComApCloud):
             payload["to"] = _to
         if value_guids is not None:
             payload["valueGuids"] = value_guids
-        values = []
         offset = 0
-        while True:
+        while offset is not None:
             payload["offset"] = offset
             response = self.get_api(
                 application=WSV_URL, api="history", unit_guid=unit_guid, payload=payload
             )
             if response is None:
-                break
-            response_json = response.json()
-            values.append(response_json["values"])
-            if response_json["nextOffset"] is None:
-                break
+                return
+            response_json = (
+                decode_models(
+                    response.content, "values", ValueHistory, self._parse_dates
+                )
+                if as_models
+                else loads(response.content)
+            )
             offset = response_json["nextOffset"]
-        for value in values:
-            for entry in value["history"]:
-                entry["validFrom"] = datetime.fromisoformat(entry["validFrom"])
-                entry["validTo"] = datetime.fromisoformat(entry["validTo"])
+            yield response_json["values"]
+
+    def _models(self, document: bytes | None, items: str, model: type) -> list:
+        """Decode the items of the API response as models (see `comap.models`)"""
+        if document is None:
+            return []
+        return decode_models(document, items, model, self._parse_dates)[items]
+
+    def _parse_history(self, values: list) -> list:
+        """Convert validFrom and validTo of a history page to datetime"""
+        if self._parse_dates:
+            for value in values:
+                parse_dates(value["history"], "validFrom", "validTo")
         return values
 
-    def files(self, unit_guid: str) -> list:
+    def sync_history(
+        self,
+        store: "HistoryStore",
+        unit_guid: str,
+        value_guids: str,
+        _from: str | None = None,
+    ) -> int:
+        """Download the history that is missing in the local store
+
+        The history is requested from the day before the last stored entry (for the
+        value stored least recently, one day earlier as the API may read the dates in
+        the local time of the unit), the overlapping entries are replaced in the store.
+
+        Parameters:
+        -----------
+        store: `HistoryStore`
+            local history store
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        value_guids: str
+            list of the value guids separated by comma
+        _from: `str` in format 'MM/DD/YYYY', optional
+            history start date, if some of the values are not stored yet
+
+        Returns:
+        --------
+        number of stored entries
+        """
+        value_guids = ",".join(guid.strip() for guid in value_guids.split(","))
+        last = [
+            store.last_valid_to(unit_guid, value_guid)
+            for value_guid in value_guids.split(",")
+        ]
+        if None not in last:
+            _from = (min(last) - timedelta(days=1)).strftime(DATE_FORMAT)
+        count = 0
+        for page in self.iter_history(unit_guid, _from, None, value_guids):
+            count += store.add_page(unit_guid, page)
+        return count
+
+    def files(self, unit_guid: str, as_models: bool = False) -> list:
         """Get Genset files
 
         Parameters:
         -----------
         unit_guid: str
             the genset ID (from the `units` API, or in WSV application front-end)
+        as_models: bool, optional
+            return `FileInfo` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
@@ -404,15 +1084,28 @@ class WSV(ComApCloud):
             'generated': `datetime`
         }]
         """
-        response = self.get_api(application=WSV_URL, api="files", unit_guid=unit_guid)
-        files = [] if response is None else response.json()["files"]
-        for file in files:
-            file["generated"] = datetime.fromisoformat(file["generated"])
+        document = self.get_document(
+            application=WSV_URL, api="files", unit_guid=unit_guid
+        )
+        if as_models:
+            return self._models(document, "files", FileInfo)
+        files = [] if document is None else loads(document)["files"]
+        if self._parse_dates:
+            parse_dates(files, "generated")
         return files
 
-    def download(self, unit_guid: str, file_name: str, path: str = "") -> bool:
+    def download(
+        self,
+        unit_guid: str,
+        file_name: str,
+        path: str = "",
+        chunk_size: int = CHUNK_SIZE,
+        resume: bool = False,
+    ) -> bool:
         """Download a file with 'file_name', store it in the 'path'
 
+        The file is streamed in chunks to '<file_name>.part' and renamed when complete.
+
         Parameters:
         -----------
         unit_guid: str
@@ -421,27 +1114,65 @@ class WSV(ComApCloud):
             List names by calling `files`
         path: str, optional
             Local directory to save the file (current directory if not specified)
+        chunk_size: int, optional
+            Size of the chunks written to the disk (in bytes)
+        resume: bool, optional
+            Continue a partial download left over by a previous failed attempt
+            (a complete '.part' file is renamed when the server responds 416)
 
         Returns:
         --------
         `bool`: Was the download succesful?
         """
-
+        file_path = os.path.join(path, file_name)
+        part_path = file_path + ".part"
+        offset = (
+            os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+        )
         response = self.get_api(
             application=WSV_URL,
             api="download",
             unit_guid=unit_guid,
             file_name=file_name,
+            headers=None if offset == 0 else {"Range": f"bytes={offset}-"},
+            stream=True,
         )
         if response is None:
             return False
+        if response.status_code == 416:
+            response.close()
+            self._report_stream(response, 0)
+            if _complete(response, offset):
+                os.replace(part_path, file_path)
+                return True
+            # the file changed on the server, start again
+            os.remove(part_path)
+            return self.download(unit_guid, file_name, path, chunk_size)
+        if response.status_code != 206:
+            offset = 0
+        size = 0
+        started = time.monotonic()
         try:
-            with open(os.path.join(path, file_name), "wb") as f:
-                f.write(response.content)
-            f.close()
+            with response, open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(part_path, file_path)
         except Exception as e:
             _LOGGER.error(f"API 'download' error {e}")
+            if not resume and os.path.exists(part_path):
+                os.remove(part_path)
             return False
+        finally:
+            self._report_stream(response, size)
+        elapsed = time.monotonic() - started
+        _LOGGER.debug(
+            "Downloaded '%s' (%d bytes) in %.2f s (%.0f bytes/s)",
+            file_name,
+            size,
+            elapsed,
+            size / elapsed if elapsed > 0 else 0,
+        )
         return True
 
     def command(self, unit_guid: str, command: str, mode: str | None = None) -> dict:
@@ -466,27 +1197,39 @@ class WSV(ComApCloud):
         response = self.post_api(
             application=WSV_URL, api="command", unit_guid=unit_guid, payload=body
         )
-        return {} if response is None else response.json()
+        return {} if response is None else loads(response.content)
 
-    def get_unit_guid(self, name: str) -> str | None:
-        """Call units API and find GUID for a unit by name
+    def get_unit_guid(self, name: str, exact: bool = False) -> str | None:
+        """Find GUID for a unit by name
+
+        The units are cached, so the units API is called only when the cache expires.
 
         Parameters:
         -----------
         name: str
             Name of the unit
+        exact: bool, optional
+            Match the whole name (otherwise the first unit containing `name` is returned)
 
         Returns:
         --------
         unitGuid (`str`) or `None`
         """
-        unit = next(
-            (unit for unit in self.units() if unit["name"].find(name) >= 0), None
-        )
-        return None if unit is None else unit["unitGuid"]
-
-    def get_value_guid(self, unit_guid: str, name: str) -> str | None:
-        """Call values API and find GUID for a value by name
+        index = self._cache.get("units")
+        if index is None:
+            units = self.units()
+            index = NameIndex(units, "unitGuid")
+            if units:
+                self._cache.set("units", index)
+        return index.find(name, exact)
+
+    def get_value_guid(
+        self, unit_guid: str, name: str, exact: bool = False
+    ) -> str | None:
+        """Find GUID for a value by name
+
+        The catalog of the unit values is cached, so the values API is called
+        only when the cache expires.
 
         Parameters:
         -----------
@@ -494,18 +1237,22 @@ class WSV(ComApCloud):
             the genset ID (from the `units` API, or in WSV application front-end)
         name: str
             Name of the value
+        exact: bool, optional
+            Match the whole name (otherwise the first value containing `name` is returned)
 
         Returns:
         --------
         valueGuid (`str`) or `None`
 
         """
-        value = next(
-            (
-                value
-                for value in self.values(unit_guid)
-                if value["name"].find(name) >= 0
-            ),
-            None,
-        )
-        return None if value is None else value["valueGuid"]
+        index = self._cache.get(("values", unit_guid))
+        if index is None:
+            values = self.values(unit_guid)
+            index = NameIndex(values, "valueGuid")
+            if values:
+                self._cache.set(("values", unit_guid), index)
+        return index.find(name, exact)
+
+    def clear_cache(self) -> None:
+        """Forget the cached units and value catalogs"""
+        self._cache.clear()
@@ -5,26 +5,85 @@ The instructions for testing and examples are available on ComAp-API repository.
 
 There are two modules available - a simpler synchronous module `comap.api` and asynchronous module `comap.api_async`. The async module is recommended for use in production.
 
-This module contains two classes:
-
-- Identity  - serves to authenticate to ComAp Cloud and obtain the token
-              used in the individual APIs.
-- WSV       - set of APIs to communicate with the WebSupervisor PRO
+This module contains these classes:
+
+- Identity        - serves to authenticate to ComAp Cloud and obtain the token
+                    used in the individual APIs.
+- TokenProvider   - keeps the token obtained from Identity up to date
+- WSV             - set of APIs to communicate with the WebSupervisor PRO
+- RateLimiter     - limits the request rate, can be shared by multiple instances
+- ValuePoller     - polls values of multiple units and reports only the changes
+- SubscriptionHub - polls values for multiple consumers with one API call per unit
+- FairScheduler   - shares a budget of requests in flight fairly between tenants
+- WSVPool         - WSV APIs of multiple tenants sharing one session and request budget
 
 """
+from __future__ import annotations
+
 import asyncio
+import inspect
+import json
 import logging
 import os
-from datetime import datetime
-
-import aiofiles
-import aiohttp
-import async_timeout
-
-from .constants import AUTHORIZATION, COMAP_KEY, IDENTITY_URL, TIMEOUT, WSV_URL
+import random
+import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Callable, Iterable
+from concurrent.futures import Executor
+from contextlib import aclosing
+from copy import copy
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from .cache import NameIndex, ResponseCache, TTLCache
+from .constants import (
+    AUTHORIZATION,
+    CACHE_SIZE,
+    CACHE_TTL,
+    CHUNK_SIZE,
+    COMAP_KEY,
+    CONCURRENCY,
+    DATE_FORMAT,
+    FILES_MANIFEST,
+    FLEET_SIGNALS,
+    HISTORY_ENTRY_SIZE,
+    HISTORY_WINDOW,
+    IDENTITY_URL,
+    OFFLOAD_SIZE,
+    POLL_INTERVAL,
+    POLL_JITTER,
+    SUBSCRIPTION_OVERFLOW,
+    SUBSCRIPTION_QUEUE_SIZE,
+    RATE_LIMIT,
+    TIMEOUT,
+    VALUE_GUID,
+    TOKEN_REFRESH_BACKOFF,
+    TOKEN_REFRESH_MARGIN,
+    WSV_URL,
+)
+from .decode import (
+    decode_history,
+    decode_response,
+    loads,
+    parse_dates,
+    parse_timestamp,
+    sort_history,
+)
+from .metrics import Metrics
+from .models import Comment, FileInfo, Unit, Value, ValueHistory, decode_models
+from .retry import RetryPolicy, parse_retry_after
+
+if TYPE_CHECKING:
+    import aiohttp
+
+    from .arrays import FleetSnapshot
+    from .store import HistoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
+# end of the values of a closed `Subscription`
+_CLOSED = object()
+
 
 class ErrorGettingData(Exception):
     """Raised when we cannot get data from API"""
@@ -36,11 +95,261 @@ class ErrorGettingData(Exception):
         return repr(self.value)
 
 
+def _complete(response, size: int) -> bool:
+    """Is the partial download of `size` bytes complete, by the 'Content-Range'
+    of the 416 (range not satisfiable) response ('bytes */<total size>')"""
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return total == str(size)
+
+
+class RateLimiter:
+    """Token bucket rate limiter with adaptive concurrency
+
+    Limits the request rate and the number of requests in flight. The number of
+    requests in flight is halved when the API responds with 429 (too many requests)
+    or 5xx, and slowly grows back with successful responses.
+    The `Retry-After` header pauses all requests. Can be shared by multiple
+    `Identity` and `WSV` instances (running in the same event loop).
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: int | None = None,
+        max_concurrency: int = CONCURRENCY,
+        min_concurrency: int = 1,
+    ) -> None:
+        """Setup of the rate limiter
+
+        Parameters:
+        -----------
+        rate: `float`, optional
+            requests per second
+        burst: `int`, optional
+            number of requests that can be sent at once (defaults to `rate`)
+        max_concurrency: `int`, optional
+            maximum number of requests in flight
+        min_concurrency: `int`, optional
+            the number of requests in flight is never reduced below this
+        """
+        self._rate = rate
+        self._burst = max(1, int(rate)) if burst is None else burst
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._min_concurrency = min_concurrency
+        self._max_concurrency = max_concurrency
+        self._concurrency = float(max_concurrency)
+        self._in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def concurrency(self) -> int:
+        """Current limit of requests in flight"""
+        return int(self._concurrency)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests in flight"""
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and a token"""
+        while self._in_flight >= self.concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_up()
+                raise
+        self._in_flight += 1
+        now = time.monotonic()
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+        self._tokens -= 1
+        delay = max(-self._tokens / self._rate, self._paused_until - now)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # cancelled before sending - return the token and the slot
+                self._tokens += 1
+                self._in_flight -= 1
+                self._wake_up()
+                raise
+
+    def release(
+        self, status: int | None = None, retry_after: str | None = None
+    ) -> None:
+        """Free the slot and adapt the concurrency to the response status
+
+        Parameters:
+        -----------
+        status: `int`, optional
+            HTTP status of the response (`None` if there was no response)
+        retry_after: `str`, optional
+            value of the `Retry-After` response header
+        """
+        self._in_flight -= 1
+        if status == 429 or (status is not None and status >= 500):
+            self._concurrency = max(self._min_concurrency, self._concurrency / 2)
+            _LOGGER.debug("Concurrency reduced to %s", self.concurrency)
+        elif status is not None and status < 400:
+            self._concurrency = min(
+                self._max_concurrency, self._concurrency + 1 / self._concurrency
+            )
+        if retry_after is not None:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + parse_retry_after(retry_after)
+            )
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        free = self.concurrency - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class FairScheduler:
+    """Shared budget of requests in flight, divided fairly between tenants
+
+    Each tenant gets its own limiter (`limiter`), passed as `rate_limiter` to its
+    `Identity` and `WSV`. When the budget is exhausted, the next free slot goes to
+    the waiting tenant with the fewest requests in flight, so a tenant sending
+    many requests cannot starve the others.
+    """
+
+    def __init__(
+        self, concurrency: int = CONCURRENCY, rate_limiter: RateLimiter | None = None
+    ) -> None:
+        """Setup of the scheduler
+
+        Parameters:
+        -----------
+        concurrency: `int`, optional
+            maximum number of requests in flight of all tenants
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate of all tenants, applied after the fair share
+        """
+        self._concurrency = concurrency
+        self._rate_limiter = rate_limiter
+        self._in_flight = 0
+        self._tenant_in_flight = Counter()
+        self._waiters = {}
+
+    def limiter(self, tenant: str) -> "TenantLimiter":
+        """Return the limiter of the tenant"""
+        return TenantLimiter(self, tenant)
+
+    def stats(self) -> dict:
+        """Return the requests in flight and waiting by tenant
+
+        Returns:
+        --------
+        `dict` by tenant
+        {
+            'in_flight': `int`,
+            'waiting': `int`
+        }
+        """
+        tenants = set(self._tenant_in_flight) | set(self._waiters)
+        return {
+            tenant: {
+                "in_flight": self._tenant_in_flight[tenant],
+                "waiting": sum(
+                    not waiter.done() for waiter in self._waiters.get(tenant, ())
+                ),
+            }
+            for tenant in sorted(tenants)
+        }
+
+    async def acquire(self, tenant: str) -> None:
+        """Wait for a slot of the tenant"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tenant, deque()).append(waiter)
+        self._wake_up()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._free(tenant)
+            raise
+        if self._rate_limiter is not None:
+            try:
+                await self._rate_limiter.acquire()
+            except BaseException:
+                self._free(tenant)
+                raise
+
+    def release(
+        self, tenant: str, status: int | None = None, retry_after: str | None = None
+    ) -> None:
+        """Free the slot of the tenant (see `RateLimiter.release`)"""
+        if self._rate_limiter is not None:
+            self._rate_limiter.release(status, retry_after)
+        self._free(tenant)
+
+    def _free(self, tenant: str) -> None:
+        self._in_flight -= 1
+        self._tenant_in_flight[tenant] -= 1
+        if not self._tenant_in_flight[tenant]:
+            del self._tenant_in_flight[tenant]
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        """Pass the free slots to the tenants with the fewest requests in flight"""
+        while self._in_flight < self._concurrency and self._waiters:
+            tenant = min(
+                self._waiters, key=lambda tenant: self._tenant_in_flight[tenant]
+            )
+            waiters = self._waiters.pop(tenant)
+            waiter = waiters.popleft()
+            if waiters:
+                # re-inserted last, so the tenants with equal share take turns
+                self._waiters[tenant] = waiters
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            self._tenant_in_flight[tenant] += 1
+            waiter.set_result(None)
+
+
+class TenantLimiter:
+    """Limiter of one tenant of the `FairScheduler`, used as `rate_limiter`"""
+
+    def __init__(self, scheduler: FairScheduler, tenant: str) -> None:
+        self._scheduler = scheduler
+        self._tenant = tenant
+
+    async def acquire(self) -> None:
+        """Wait for a slot of the tenant"""
+        await self._scheduler.acquire(self._tenant)
+
+    def release(
+        self, status: int | None = None, retry_after: str | None = None
+    ) -> None:
+        """Free the slot of the tenant"""
+        self._scheduler.release(self._tenant, status, retry_after)
+
+
 class ComApCloud:
     """The base class for both APIs"""
 
     def __init__(
-        self, session: aiohttp.ClientSession, headers: dict, login_id: str = None
+        self,
+        session: aiohttp.ClientSession,
+        headers: dict,
+        login_id: str = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
     ) -> None:
         """Create ComAp Cloud API instance
 
@@ -52,10 +361,24 @@ class ComApCloud:
             Contain ComAp Key, and for WSV API Authorization (Bearer token)
         login_id: `str`, optional
             the user name (each identity can have multiple user names)
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
         """
         self._headers = headers
         self._session = session
         self._login_id = login_id
+        self._token_provider = None
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy
+        self._metrics = metrics
+        self._in_flight = {}
+        self._executor = None
+        self._offload_size = OFFLOAD_SIZE
+        self._response_cache = None
 
     async def get_api(
         self,
@@ -64,6 +387,8 @@ class ComApCloud:
         unit_guid: str | None = None,
         file_name: str | None = None,
         payload: dict | None = None,
+        headers: dict | None = None,
+        stream: bool = False,
     ) -> aiohttp.ClientResponse | None:
         """Call ComAp GET API.
 
@@ -79,6 +404,12 @@ class ComApCloud:
             for WSV download API - file name
         payload: `dict`, optional
             some APIs require a payload
+        headers: `dict`, optional
+            additional request headers
+        stream: `bool`, optional
+            the caller reads the body in chunks (the request is not reported
+            to the `metrics` hooks, the caller reports it with the size read,
+            as `download` does)
 
         Returns:
         --------
@@ -91,27 +422,179 @@ class ComApCloud:
             login_id=self._login_id, unit_guid=unit_guid, file_name=file_name
         )
         _body = {} if payload is None else payload
-        try:
-            with async_timeout.timeout(TIMEOUT):
-                response = await self._session.get(
-                    _url, headers=self._headers, params=_body
-                )
-            if response.status != 200:
-                response_text = await response.text()
-                _LOGGER.error(
-                    "API GET '%s' returned code: %s (%s)",
-                    api,
-                    response.status,
-                    response_text,
-                )
-                return None
-        except asyncio.TimeoutError:
-            _LOGGER.error("API GET '%s' response timeout", api)
+        return await self._request(
+            "GET",
+            api,
+            _url,
+            headers=headers,
+            unit_guid=unit_guid,
+            stream=stream,
+            params=_body,
+        )
+
+    async def get_document(
+        self,
+        application: dict,
+        api: str,
+        unit_guid: str | None = None,
+        payload: dict | None = None,
+    ) -> bytes | None:
+        """Call ComAp GET API and return the response body, using the response cache
+
+        The cached APIs are called with the validators of the cached response
+        ('If-None-Match', 'If-Modified-Since'), the cached body is returned
+        if the API responds 304 (not modified).
+
+        Parameters are the same as for `get_api`.
+
+        Returns:
+        --------
+        `bytes` or `None` if not succesfull
+        """
+        cache = self._response_cache
+        if cache is None or api not in cache.apis:
+            response = await self.get_api(
+                application=application, api=api, unit_guid=unit_guid, payload=payload
+            )
+            return None if response is None else await response.read()
+        key = cache.key(
+            application.get(api),
+            self._login_id,
+            unit_guid,
+            None if payload is None else sorted(payload.items()),
+        )
+        body, validators = await self._cached(cache.lookup, key)
+        if body is not None:
+            return body
+        response = await self.get_api(
+            application=application,
+            api=api,
+            unit_guid=unit_guid,
+            payload=payload,
+            headers=validators or None,
+        )
+        if response is None:
             return None
-        except Exception as e:
-            _LOGGER.error(f"API GET '%s' error %s", api, e)
+        if response.status == 304:
+            response.release()
+            body = await self._cached(cache.not_modified, key)
+            if body is not None:
+                return body
+            # evicted meanwhile, download it again
+            response = await self.get_api(
+                application=application, api=api, unit_guid=unit_guid, payload=payload
+            )
+            if response is None:
+                return None
+        body = await response.read()
+        await self._cached(
+            cache.store,
+            key,
+            body,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        return body
+
+    async def _cached(self, method: Callable, *args) -> Any:
+        """Call the response cache, in a thread if it reads and writes the disk"""
+        if not self._response_cache.on_disk:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def get_json(
+        self,
+        application: dict,
+        api: str,
+        unit_guid: str | None = None,
+        payload: dict | None = None,
+        coalesce: bool = True,
+        items: str | None = None,
+        model: type | None = None,
+    ) -> dict | list | None:
+        """Call ComAp GET API and return the parsed response.
+
+        Parameters:
+        -----------
+        application: `dict`
+            points to dictionary of URLs for different APIs
+        api: `str`
+            one of the keys in the application dictionary
+        unit_guid: `str`, optional
+            for WSV API - the genset ID (from the `units` API, or in WSV application front-end)
+        payload: `dict`, optional
+            some APIs require a payload
+        coalesce: `bool`, optional
+            identical concurrent calls share one request and its result
+            (the same object, which must not be modified then - `units`, `info`
+            and `files` return a copy to each caller)
+        items: `str`, optional
+            the key of the `list` of items in the response, decoded as `model`
+        model: `type`, optional
+            decode the `items` straight into the models (see `comap.models.decode_models`)
+
+        Returns:
+        --------
+        parsed JSON response or `None` if not succesfull
+        """
+        if not coalesce:
+            return await self._get_json(
+                application, api, unit_guid, payload, items, model
+            )
+        key = (
+            application.get(api),
+            unit_guid,
+            None if payload is None else tuple(sorted(payload.items())),
+            model,
+        )
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._get_json(application, api, unit_guid, payload, items, model)
+            )
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # a cancelled caller does not cancel the request shared with the others
+        return await asyncio.shield(future)
+
+    async def _get_json(
+        self,
+        application: dict,
+        api: str,
+        unit_guid: str | None,
+        payload: dict | None,
+        items: str | None = None,
+        model: type | None = None,
+    ) -> dict | list | None:
+        """Send the GET request and parse the response"""
+        document = await self.get_document(
+            application=application, api=api, unit_guid=unit_guid, payload=payload
+        )
+        if document is None:
             return None
-        return response
+        if model is not None:
+            return await self._decode(
+                document, decode_models, items, model, self._parse_dates
+            )
+        return await self._decode(document)
+
+    async def _decode(
+        self, document: bytes, decoder: Callable = decode_response, *args
+    ) -> Any:
+        """Decode the response body, in the executor if it is large"""
+        return await self._offload(len(document), decoder, document, *args)
+
+    async def _offload(self, size: int, function: Callable, *args) -> Any:
+        """Call the function, in the executor if its data is large (`size` bytes)"""
+        if self._executor is None or size < self._offload_size:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def _date_keys(self, *keys: str) -> tuple:
+        """The timestamp fields to convert, none if `parse_dates` is disabled"""
+        return keys if self._parse_dates else ()
 
     async def post_api(
         self,
@@ -119,6 +602,7 @@ class ComApCloud:
         api: str,
         unit_guid: str | None = None,
         payload: dict | None = None,
+        retry: bool = False,
     ) -> aiohttp.ClientResponse | None:
         """Call ComAp POST API.
 
@@ -132,6 +616,8 @@ class ComApCloud:
             for WSV API - the genset ID (from the `units` API, or in WSV application front-end)
         payload: `dict`, optional
             some APIs require a payload
+        retry: `bool`, optional
+            the call is idempotent and can be repeated according to the retry policy
 
         Returns:
         --------
@@ -142,33 +628,185 @@ class ComApCloud:
             return None
         _url = application[api].format(login_id=self._login_id, unit_guid=unit_guid)
         _body = {} if payload is None else payload
+        return await self._request(
+            "POST", api, _url, retry=retry, unit_guid=unit_guid, json=_body
+        )
+
+    async def _request(
+        self,
+        method: str,
+        api: str,
+        url: str,
+        headers: dict | None = None,
+        retry: bool = True,
+        unit_guid: str | None = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> aiohttp.ClientResponse | None:
+        """Send the request, report it to the metrics hooks with the size of the body
+
+        Unless streamed, the body is read before reporting (and kept in the response).
+        """
+        if self._metrics is None:
+            response, _, _ = await self._attempts(
+                method, api, url, headers, retry, **kwargs
+            )
+            return response
+        context = self._metrics.on_request_start(method, api, unit_guid)
+        started = time.perf_counter()
+        response = status = None
+        retries = 0
+        size = None
         try:
-            with async_timeout.timeout(TIMEOUT):
-                response = await self._session.post(
-                    _url, headers=self._headers, json=_body
-                )
-            if response.status != 200:
-                response_text = await response.text()
-                _LOGGER.error(
-                    "API POST '%s' returned code: %s (%s)",
-                    api,
-                    response.status,
-                    response_text,
-                )
-                return None
-        except asyncio.TimeoutError:
-            _LOGGER.error("API POST '%s' response timeout", api)
-            return None
-        except Exception as e:
-            _LOGGER.error("API POST '%s' error %s", api, e)
+            response, status, retries = await self._attempts(
+                method, api, url, headers, retry, **kwargs
+            )
+            if response is not None and not stream:
+                size = len(await response.read())
+            return response
+        finally:
+            report = (context, method, api, unit_guid, status, started, retries)
+            if response is not None and stream:
+                # the body is not read yet, reported by `_report_stream`
+                response._comap_report = report
+            else:
+                self._report(report, size)
+
+    def _report(self, report: tuple, size: int | None) -> None:
+        """Call the metrics hook at the end of the request"""
+        context, method, api, unit_guid, status, started, retries = report
+        self._metrics.on_request_end(
+            context,
+            method,
+            api,
+            unit_guid,
+            status,
+            size,
+            time.perf_counter() - started,
+            retries,
+        )
+
+    def _report_stream(self, response: aiohttp.ClientResponse, size: int) -> None:
+        """Report the streamed request when its body was read (`size` bytes)"""
+        report = getattr(response, "_comap_report", None)
+        if report is not None:
+            del response._comap_report
+            self._report(report, size)
+
+    async def _attempts(
+        self,
+        method: str,
+        api: str,
+        url: str,
+        headers: dict | None,
+        retry: bool,
+        **kwargs,
+    ) -> tuple:
+        """Send the request, repeat it on transient errors or with a new token
+
+        Return the response (`None` if not succesfull), the last status and the
+        number of retries.
+        """
+        import aiohttp
+
+        refreshed = False
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            token = (
+                None
+                if self._token_provider is None
+                else await self._token_provider.token()
+            )
+            _headers = {**self._headers, **(headers or {})}
+            if token is not None:
+                _headers[AUTHORIZATION] = "Bearer " + token
+            status = retry_after = None
+            try:
+                response = await self._send(method, url, headers=_headers, **kwargs)
+                if (
+                    response.status == 401
+                    and self._token_provider is not None
+                    and not refreshed
+                ):
+                    response.release()
+                    await self._token_provider.refresh(stale_token=token)
+                    refreshed = True
+                    continue
+                # 416 answers a resumed download with nothing left (see `download`)
+                if response.status in (200, 206, 304) or (
+                    response.status == 416 and "Range" in _headers
+                ):
+                    return response, response.status, attempt
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                error = f"returned code: {status} ({await response.text()})"
+            except asyncio.TimeoutError:
+                error = "response timeout"
+            except aiohttp.ClientError as e:
+                error = f"error {e}"
+            except Exception as e:
+                _LOGGER.error("API %s '%s' error %s", method, api, e)
+                return None, status, attempt
+            delay = self._retry_delay(retry, api, status, attempt, started, retry_after)
+            if delay is None:
+                _LOGGER.error("API %s '%s' %s", method, api, error)
+                return None, status, attempt
+            _LOGGER.debug(
+                "API %s '%s' %s, retrying in %.1f s", method, api, error, delay
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(
+        self,
+        retry: bool,
+        api: str,
+        status: int | None,
+        attempt: int,
+        started: float,
+        retry_after: str | None = None,
+    ) -> float | None:
+        """Delay before repeating the failed request, `None` if not repeated"""
+        if not retry or self._retry_policy is None:
             return None
-        return response
+        return self._retry_policy.retry_delay(
+            api, status, attempt, started, retry_after
+        )
+
+    async def _send(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """Send one request, respecting the rate limiter
+
+        The time waiting for the rate limiter is not counted in the `TIMEOUT`.
+        """
+        import async_timeout
+
+        if self._rate_limiter is None:
+            async with async_timeout.timeout(TIMEOUT):
+                return await self._session.request(method, url, **kwargs)
+        await self._rate_limiter.acquire()
+        status = retry_after = None
+        try:
+            async with async_timeout.timeout(TIMEOUT):
+                response = await self._session.request(method, url, **kwargs)
+            status = response.status
+            retry_after = response.headers.get("Retry-After")
+            return response
+        finally:
+            self._rate_limiter.release(status, retry_after)
 
 
 class Identity(ComApCloud):
     """ComAp Cloud Identity API wrapper"""
 
-    def __init__(self, session: aiohttp.ClientSession, key: str) -> None:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        key: str,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
         """Setup of the ComAp Cloud Identity API class
 
         Parameters:
@@ -177,10 +815,19 @@ class Identity(ComApCloud):
             HTTPS connection pool instance
         key: `str`
             ComAp Key (from the API profile)
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
         """
         super().__init__(
             session=session,
             headers={"Content-Type": "application/json", COMAP_KEY: key},
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            metrics=metrics,
         )
 
     async def authenticate(self, client_id: str, secret: str) -> dict | None:
@@ -207,16 +854,131 @@ class Identity(ComApCloud):
         """
         body = {"clientId": client_id, "secret": secret}
         response = await self.post_api(
-            application=IDENTITY_URL, api="authenticate", payload=body
+            application=IDENTITY_URL, api="authenticate", payload=body, retry=True
         )
-        return None if response is None else await response.json()
+        return None if response is None else loads(await response.read())
+
+
+class TokenProvider:
+    """Obtain the Bearer token from the Identity API and refresh it before it expires"""
+
+    def __init__(
+        self,
+        identity: Identity,
+        client_id: str,
+        secret: str,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        refresh_backoff: float = TOKEN_REFRESH_BACKOFF,
+    ) -> None:
+        """Setup of the token provider
+
+        Parameters:
+        -----------
+        identity: `Identity`
+            ComAp Cloud Identity API instance
+        client_id: `str`
+            see `Identity.authenticate`
+        secret: `str`
+            see `Identity.authenticate`
+        refresh_margin: `float`, optional
+            refresh the token in the background this many seconds before it expires
+        refresh_backoff: `float`, optional
+            time (in seconds) before the next background refresh after a failed one
+        """
+        self._identity = identity
+        self._client_id = client_id
+        self._secret = secret
+        self._refresh_margin = refresh_margin
+        self._refresh_backoff = refresh_backoff
+        self._token = None
+        self._expires = 0.0
+        self._retry_at = 0.0
+        self._refreshing = None
+
+    async def token(self) -> str | None:
+        """Return the current token
+
+        An expired token is refreshed before returning. A token that is about
+        to expire is returned and refreshed in the background, after a failed
+        background refresh the next one starts `refresh_backoff` seconds later.
+
+        Returns:
+        --------
+        Bearer access token (`str`) or `None` if the authentication failed
+        """
+        now = time.monotonic()
+        if self._token is None or now >= self._expires:
+            return await self.refresh(stale_token=self._token)
+        if now >= self._expires - self._refresh_margin and now >= self._retry_at:
+            self._start_refresh()
+        return self._token
+
+    async def refresh(self, stale_token: str | None = None) -> str | None:
+        """Authenticate and return the new token
+
+        Concurrent calls share one request to the Identity API.
+
+        Parameters:
+        -----------
+        stale_token: `str`, optional
+            the token that was rejected - if it has already been replaced,
+            the new token is returned without authenticating again
+
+        Returns:
+        --------
+        Bearer access token (`str`) or `None` if the authentication failed
+        """
+        if self._token is not None and self._token != stale_token:
+            return self._token
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Future:
+        """Start authentication unless it is already in progress"""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._authenticate())
+            # nobody awaits a background refresh, its error is retrieved here
+            self._refreshing.add_done_callback(self._refreshed)
+        return self._refreshing
+
+    async def _authenticate(self) -> str | None:
+        try:
+            token = await self._identity.authenticate(self._client_id, self._secret)
+        finally:
+            self._refreshing = None
+        if token is None:
+            self._retry_at = time.monotonic() + self._refresh_backoff
+            return self._token
+        self._token = token["access_token"]
+        self._expires = time.monotonic() + float(token["expires_in"])
+        self._retry_at = 0.0
+        return self._token
+
+    def _refreshed(self, future: asyncio.Future) -> None:
+        """Log the error of a failed refresh and delay the next one"""
+        if future.cancelled() or future.exception() is None:
+            return
+        _LOGGER.error("Error refreshing the token: %s", future.exception())
+        self._retry_at = time.monotonic() + self._refresh_backoff
 
 
 class WSV(ComApCloud):
     """ComAp Cloud WSV API wrapper"""
 
     def __init__(
-        self, session: aiohttp.ClientSession, login_id: str, key: str, token: str
+        self,
+        session: aiohttp.ClientSession,
+        login_id: str,
+        key: str,
+        token: str | TokenProvider,
+        cache_ttl: float = CACHE_TTL,
+        cache_size: int = CACHE_SIZE,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+        parse_dates: bool = True,
+        executor: Executor | None = None,
+        offload_size: int = OFFLOAD_SIZE,
+        response_cache: ResponseCache | None = None,
     ) -> None:
         """Setup of the ComAp Cloud WSV API class
 
@@ -228,22 +990,61 @@ class WSV(ComApCloud):
             the user name (each identity can have multiple user names)
         key: `str`
             ComAp Key (from the API profile)
-        token: `str`
-            The Bearer token received from Identity API authenticate
+        token: `str` or `TokenProvider`
+            The Bearer token received from Identity API authenticate,
+            or the provider refreshing the token before it expires
+        cache_ttl: `float`, optional
+            time (in seconds) to cache the units and value catalogs used to find GUIDs by name
+        cache_size: `int`, optional
+            maximum number of cached units and value catalogs
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate (can be shared with other instances)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
+        parse_dates: `bool`, optional
+            convert the timestamps in the results to `datetime`. If disabled,
+            the timestamps are kept as ISO 8601 strings (faster)
+        executor: `concurrent.futures.Executor`, optional
+            thread or process pool decoding the large responses (and converting
+            their timestamps), so the event loop is not blocked
+        offload_size: `int`, optional
+            responses of at least this size (in bytes) are decoded in the `executor`
+        response_cache: `ResponseCache`, optional
+            cache of the metadata responses (units, info, files, comments)
+            validated by ETag / Last-Modified (can be shared with other instances)
         """
+        headers = {"Content-Type": "application/json", COMAP_KEY: key}
+        if isinstance(token, str):
+            headers[AUTHORIZATION] = "Bearer " + token
         super().__init__(
             session=session,
-            headers={
-                "Content-Type": "application/json",
-                COMAP_KEY: key,
-                AUTHORIZATION: "Bearer " + token,
-            },
+            headers=headers,
             login_id=login_id,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            metrics=metrics,
         )
-
-    async def units(self) -> list:
+        if isinstance(token, TokenProvider):
+            self._token_provider = token
+        self._cache = TTLCache(cache_ttl, cache_size)
+        self._parse_dates = parse_dates
+        self._executor = executor
+        self._offload_size = offload_size
+        self._response_cache = response_cache
+
+    async def units(self, coalesce: bool = True, as_models: bool = False) -> list:
         """Get list of all units
 
+        Parameters:
+        -----------
+        coalesce: bool, optional
+            concurrent calls share one request (each caller gets its own copy
+            of the units)
+        as_models: bool, optional
+            return `Unit` models instead of `dict` (see `comap.models`)
+
         Returns:
         --------
         `list` of `dict`
@@ -253,11 +1054,20 @@ class WSV(ComApCloud):
             'url': `str`
         }]
         """
-        response = await self.get_api(application=WSV_URL, api="units")
-        response_json = {"units": []} if response is None else await response.json()
-        return response_json["units"]
+        response_json = await self.get_json(
+            application=WSV_URL,
+            api="units",
+            coalesce=coalesce,
+            items="units",
+            model=Unit if as_models else None,
+        )
+        units = [] if response_json is None else response_json["units"]
+        # the shared response is not modified, each caller gets its own list
+        return [copy(unit) for unit in units]
 
-    async def values(self, unit_guid: str, value_guids: str | None = None) -> list:
+    async def values(
+        self, unit_guid: str, value_guids: str | None = None, as_models: bool = False
+    ) -> list:
         """Get Genset values
 
         Parameters:
@@ -267,6 +1077,8 @@ class WSV(ComApCloud):
         value_guids: str, optional
             list of the value guids separated by comma
             (get it by calling this function with no parameter or `get_value_guid`)
+        as_models: bool, optional
+            return `Value` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
@@ -293,19 +1105,144 @@ class WSV(ComApCloud):
                 unit_guid=unit_guid,
                 payload={"valueGuids": value_guids},
             )
-        response_json = {"values": []} if response is None else await response.json()
-        values = response_json["values"]
-        for value in values:
-            value["timeStamp"] = datetime.fromisoformat(value["timeStamp"])
-        return values
+        if response is None:
+            return []
+        if as_models:
+            response_json = await self._decode(
+                await response.read(), decode_models, "values", Value, self._parse_dates
+            )
+        else:
+            response_json = await self._decode(
+                await response.read(),
+                decode_response,
+                "values",
+                *self._date_keys("timeStamp"),
+            )
+        return response_json["values"]
+
+    async def values_many(
+        self,
+        unit_guids: Iterable[str],
+        value_guids: str | None = None,
+        concurrency: int = CONCURRENCY,
+        timeout: float = TIMEOUT,
+    ) -> dict:
+        """Get values of multiple Gensets concurrently
+
+        Parameters:
+        -----------
+        unit_guids: `Iterable` of `str`
+            the genset IDs (from the `units` API, or in WSV application front-end)
+        value_guids: str, optional
+            list of the value guids separated by comma
+        concurrency: int, optional
+            maximum number of requests in flight
+        timeout: float, optional
+            time limit for each unit (in seconds)
+
+        Returns:
+        --------
+        `dict` of `list` - values (see `values`) by unitGuid, in the order of `unit_guids`.
+        Units that failed or timed out have an empty `list`.
+        """
+        unit_guids = list(unit_guids)
+        result = dict.fromkeys(unit_guids)
+        async for unit_guid, values in self.iter_values(
+            unit_guids, value_guids, concurrency, timeout
+        ):
+            result[unit_guid] = values
+        return result
+
+    async def fleet_snapshot(
+        self,
+        unit_guids: Iterable[str] | None = None,
+        signals: Iterable[str] = FLEET_SIGNALS,
+        concurrency: int = CONCURRENCY,
+        timeout: float = TIMEOUT,
+    ) -> "FleetSnapshot":
+        """Get the standard signals of multiple Gensets as a unit x signal matrix
+
+        Requires `numpy`.
 
-    async def info(self, unit_guid: str) -> dict:
+        Parameters:
+        -----------
+        unit_guids: `Iterable` of `str`, optional
+            the genset IDs (all units if not specified)
+        signals: `Iterable` of `str`, optional
+            names of the signals in `comap.constants.VALUE_GUID`
+        concurrency: int, optional
+            maximum number of requests in flight
+        timeout: float, optional
+            time limit for each unit (in seconds)
+
+        Returns:
+        --------
+        `FleetSnapshot` (see `comap.arrays.FleetSnapshot`) - the values as a NumPy
+        matrix with the timestamp of each cell. Units that failed have `NaN` values.
+        """
+        from .arrays import FleetSnapshot
+
+        value_guids = {}
+        for signal in signals:
+            if signal not in VALUE_GUID:
+                _LOGGER.error("Unknown signal '%s'!", signal)
+                continue
+            value_guids[signal] = VALUE_GUID[signal]
+        if unit_guids is None:
+            unit_guids = [unit["unitGuid"] for unit in await self.units()]
+        values = await self.values_many(
+            unit_guids, ",".join(value_guids.values()), concurrency, timeout
+        )
+        return FleetSnapshot(list(values), value_guids, values)
+
+    async def iter_values(
+        self,
+        unit_guids: Iterable[str],
+        value_guids: str | None = None,
+        concurrency: int = CONCURRENCY,
+        timeout: float = TIMEOUT,
+    ) -> AsyncIterator[tuple[str, list]]:
+        """Get values of multiple Gensets concurrently, yield them as they arrive
+
+        Parameters are the same as for `values_many`.
+
+        Yields:
+        -------
+        `tuple` (unitGuid, `list` of values) in the order of completion
+        """
+        import async_timeout
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(unit_guid: str) -> tuple[str, list]:
+            async with semaphore:
+                try:
+                    async with async_timeout.timeout(timeout):
+                        return unit_guid, await self.values(unit_guid, value_guids)
+                except asyncio.TimeoutError:
+                    _LOGGER.error("API GET 'values' for unit %s timeout", unit_guid)
+                except Exception as e:
+                    _LOGGER.error("API GET 'values' for unit %s error %s", unit_guid, e)
+                return unit_guid, []
+
+        tasks = [asyncio.ensure_future(fetch(unit_guid)) for unit_guid in unit_guids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def info(self, unit_guid: str, coalesce: bool = True) -> dict:
         """Get Genset info
 
         Parameters:
         -----------
         unit_guid: str
             the genset ID (from the `units` API, or in WSV application front-end)
+        coalesce: bool, optional
+            concurrent calls for the same unit share one request (each caller gets
+            its own copy of the info)
 
         Returns:
         --------
@@ -328,18 +1265,23 @@ class WSV(ComApCloud):
             'longitude': `number`}
         }
         """
-        response = await self.get_api(
-            application=WSV_URL, api="info", unit_guid=unit_guid
+        response_json = await self.get_json(
+            application=WSV_URL, api="info", unit_guid=unit_guid, coalesce=coalesce
         )
-        return {} if response is None else await response.json()
+        if response_json is None:
+            return {}
+        # the shared response is not modified, copied with 'connection' and 'position'
+        return {key: copy(value) for key, value in response_json.items()}
 
-    async def comments(self, unit_guid: str) -> list:
+    async def comments(self, unit_guid: str, as_models: bool = False) -> list:
         """Get Genset comments
 
         Parameters:
         -----------
         unit_guid: str
             the genset ID (from the `units` API, or in WSV application front-end)
+        as_models: bool, optional
+            return `Comment` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
@@ -352,14 +1294,20 @@ class WSV(ComApCloud):
             "active": `Boolean`
         }]
         """
-        response = await self.get_api(
+        document = await self.get_document(
             application=WSV_URL, api="comments", unit_guid=unit_guid
         )
-        response_json = {"comments": []} if response is None else await response.json()
-        comments = response_json["comments"]
-        for comment in comments:
-            comment["date"] = datetime.fromisoformat(comment["date"])
-        return comments
+        if document is None:
+            return []
+        if as_models:
+            response_json = await self._decode(
+                document, decode_models, "comments", Comment, self._parse_dates
+            )
+        else:
+            response_json = await self._decode(
+                document, decode_response, "comments", *self._date_keys("date")
+            )
+        return response_json["comments"]
 
     async def history(
         self,
@@ -367,7 +1315,9 @@ class WSV(ComApCloud):
         _from: str | None = None,
         _to: str | None = None,
         value_guids: str | None = None,
-    ) -> list:
+        as_arrays: bool = False,
+        as_models: bool = False,
+    ) -> list | dict:
         """Get Genset history
 
         Parameters:
@@ -381,51 +1331,365 @@ class WSV(ComApCloud):
         value_guids: `list`, optional
             list of the value guids separated by comma
             (get it by calling `values` or `get_value_guid`)
+        as_arrays: `bool`, optional
+            return NumPy arrays per value GUID (requires `numpy`)
+        as_models: `bool`, optional
+            return pages of `ValueHistory` models instead of `dict` (see `comap.models`)
 
         Returns:
         --------
-        `list` of `dict`
-        [{
-            'value': `str`,
-            'validFrom': `datetime`,
-            'validTo': `datetime`
-        }]
+        `list` of pages (see `iter_history`),
+        or `dict` of arrays by valueGuid if `as_arrays` (see `comap.arrays.HistoryArrays`)
         """
-        payload = {}
-        if _from is not None:
-            payload["from"] = _from
-        if _to is not None:
-            payload["to"] = _to
-        if value_guids is not None:
-            payload["valueGuids"] = value_guids
-        values = []
-        offset = 0
-        while True:
-            payload["offset"] = offset
-            response = await self.get_api(
-                application=WSV_URL, api="history", unit_guid=unit_guid, payload=payload
+        if as_arrays:
+            from .arrays import HistoryArrays
+
+            arrays = HistoryArrays()
+            async with aclosing(
+                self._history_pages(unit_guid, _from, _to, value_guids)
+            ) as pages:
+                async for values in pages:
+                    arrays.add_page(values)
+            return arrays.result()
+        return [
+            page
+            async for page in self.iter_history(
+                unit_guid, _from, _to, value_guids, as_models
             )
-            if response is None:
-                break
-            response_json = await response.json()
-            values.append(response_json["values"])
-            if response_json["nextOffset"] is None:
-                break
-            offset = response["nextOffset"]
-        for value in values:
-            for entry in value["history"]:
-                entry["validFrom"] = datetime.fromisoformat(entry["validFrom"])
-                entry["validTo"] = datetime.fromisoformat(entry["validTo"])
-        return values
+        ]
 
-    async def files(self, unit_guid: str) -> list:
-        """Get Genset files
+    async def history_many(
+        self,
+        unit_guids: Iterable[str],
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+        concurrency: int = CONCURRENCY,
+        as_arrays: bool = False,
+    ) -> dict:
+        """Get history of multiple Gensets concurrently
 
         Parameters:
         -----------
-        unit_guid: str
-            the genset ID (from the `units` API, or in WSV application front-end)
-
+        unit_guids: `Iterable` of `str`
+            the genset IDs (from the `units` API, or in WSV application front-end)
+        _from: `str` in format 'MM/DD/YYYY', optional
+            history start date
+        _to: `str` in format 'MM/DD/YYYY', optional
+            history end date
+        value_guids: `list`, optional
+            list of the value guids separated by comma
+        concurrency: int, optional
+            maximum number of units downloaded at once
+        as_arrays: `bool`, optional
+            return NumPy arrays per value GUID (requires `numpy`)
+
+        Returns:
+        --------
+        `dict` - history (see `history`) by unitGuid, in the order of `unit_guids`.
+        Units that failed have an empty result.
+        """
+        unit_guids = list(unit_guids)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(unit_guid: str) -> list | dict:
+            async with semaphore:
+                try:
+                    return await self.history(
+                        unit_guid, _from, _to, value_guids, as_arrays
+                    )
+                except Exception as e:
+                    _LOGGER.error(
+                        "API GET 'history' for unit %s error %s", unit_guid, e
+                    )
+                return {} if as_arrays else []
+
+        results = await asyncio.gather(*(fetch(unit_guid) for unit_guid in unit_guids))
+        return dict(zip(unit_guids, results))
+
+    async def history_parallel(
+        self,
+        unit_guid: str,
+        _from: str,
+        _to: str,
+        value_guids: str | None = None,
+        window: int = HISTORY_WINDOW,
+        group_size: int | None = None,
+        concurrency: int = CONCURRENCY,
+        as_models: bool = False,
+    ) -> list:
+        """Get Genset history of a long period in time windows downloaded concurrently
+
+        The history pages can only be read one after another, so the period is split
+        into windows of `window` days (and the values optionally into groups),
+        each paginated separately. The entries are merged in the order of 'validFrom',
+        entries returned by two neighbouring windows are included only once.
+        The merged history is sorted in the `executor` if it is large.
+
+        Raises `ErrorGettingData` (listing the failed windows) if a page of any window
+        cannot be downloaded, so the result never has a gap.
+        Raises `ValueError` if `window` or `concurrency` is not positive.
+
+        Parameters:
+        -----------
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        _from: `str` in format 'MM/DD/YYYY'
+            history start date
+        _to: `str` in format 'MM/DD/YYYY'
+            history end date
+        value_guids: `list`, optional
+            list of the value guids separated by comma
+            (get it by calling `values` or `get_value_guid`)
+        window: `int`, optional
+            length of the time windows (in days)
+        group_size: `int`, optional
+            number of value guids requested together (all at once if not specified)
+        concurrency: int, optional
+            maximum number of windows downloaded at once
+        as_models: `bool`, optional
+            return `ValueHistory` models instead of `dict` (see `comap.models`)
+
+        Returns:
+        --------
+        history of each value (one merged page, see `iter_history`)
+        """
+        if window <= 0 or concurrency < 1:
+            raise ValueError("window and concurrency must be positive")
+        start = datetime.strptime(_from, DATE_FORMAT)
+        end = datetime.strptime(_to, DATE_FORMAT)
+        windows = []
+        while True:
+            window_end = min(start + timedelta(days=window), end)
+            windows.append(
+                (start.strftime(DATE_FORMAT), window_end.strftime(DATE_FORMAT))
+            )
+            if window_end >= end:
+                break
+            start = window_end
+        if value_guids is None or group_size is None:
+            groups = [value_guids]
+        else:
+            guids = value_guids.split(",")
+            groups = [
+                ",".join(guids[i : i + group_size])
+                for i in range(0, len(guids), group_size)
+            ]
+        semaphore = asyncio.Semaphore(concurrency)
+        merged = {}
+
+        async def fetch(window_from: str, window_to: str, group: str | None) -> None:
+            async with semaphore:
+                async with aclosing(
+                    self._history_pages(
+                        unit_guid, window_from, window_to, group, strict=True
+                    )
+                ) as pages:
+                    async for values in pages:
+                        for value in values:
+                            entries = merged.setdefault(value["valueGuid"], {})
+                            for entry in value["history"]:
+                                entries.setdefault(entry["validFrom"], entry)
+
+        requests = [
+            (window_from, window_to, group)
+            for window_from, window_to in windows
+            for group in groups
+        ]
+        results = await asyncio.gather(
+            *(fetch(*request) for request in requests), return_exceptions=True
+        )
+        failed = [
+            request
+            for request, result in zip(requests, results)
+            if isinstance(result, BaseException)
+        ]
+        if failed:
+            raise ErrorGettingData(f"History windows not downloaded: {failed}")
+        values = [
+            {"valueGuid": value_guid, "history": list(entries.values())}
+            for value_guid, entries in merged.items()
+        ]
+        values = await self._offload(
+            sum(len(entries) for entries in merged.values()) * HISTORY_ENTRY_SIZE,
+            sort_history,
+            values,
+            *self._date_keys("validFrom", "validTo"),
+        )
+        if as_models:
+            return [ValueHistory.from_dict(value) for value in values]
+        return values
+
+    async def iter_history(
+        self,
+        unit_guid: str,
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+        as_models: bool = False,
+    ) -> AsyncIterator[list]:
+        """Get Genset history page by page
+
+        The next page is downloaded while the caller processes the current one,
+        so at most two pages are kept in memory. Parameters are the same as for `history`.
+
+        Yields:
+        -------
+        page - `list` of `dict`
+        [{
+            'valueGuid': `str`,
+            'history': [{
+                'value': `str`,
+                'validFrom': `datetime`,
+                'validTo': `datetime`
+            }]
+        }]
+        or `list` of `ValueHistory` if `as_models`
+        """
+        async with aclosing(
+            self._history_pages(
+                unit_guid, _from, _to, value_guids, parse=True, as_models=as_models
+            )
+        ) as pages:
+            async for values in pages:
+                yield values
+
+    async def _history_pages(
+        self,
+        unit_guid: str,
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+        parse: bool = False,
+        strict: bool = False,
+        as_models: bool = False,
+    ) -> AsyncIterator[list]:
+        """Yield the 'values' of the history API responses, prefetching the next page
+
+        The timestamps are converted (in the executor) if `parse` and `parse_dates`,
+        the values are decoded as `ValueHistory` models if `as_models`.
+        If a page cannot be downloaded, the iteration stops, or raises
+        `ErrorGettingData` if `strict`.
+        """
+        payload = {}
+        if _from is not None:
+            payload["from"] = _from
+        if _to is not None:
+            payload["to"] = _to
+        if value_guids is not None:
+            payload["valueGuids"] = value_guids
+        payload["offset"] = 0
+        next_page = asyncio.ensure_future(
+            self._history_page(unit_guid, payload, parse, as_models)
+        )
+        try:
+            while next_page is not None:
+                response_json = await next_page
+                next_page = None
+                if response_json is None:
+                    if strict:
+                        raise ErrorGettingData(
+                            f"History page {payload['offset']} of {unit_guid} failed"
+                        )
+                    return
+                if response_json["nextOffset"] is not None:
+                    payload = {**payload, "offset": response_json["nextOffset"]}
+                    next_page = asyncio.ensure_future(
+                        self._history_page(unit_guid, payload, parse, as_models)
+                    )
+                yield response_json["values"]
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def _history_page(
+        self,
+        unit_guid: str,
+        payload: dict,
+        parse: bool = False,
+        as_models: bool = False,
+    ) -> dict | None:
+        """Get one page of the history API response"""
+        response = await self.get_api(
+            application=WSV_URL, api="history", unit_guid=unit_guid, payload=payload
+        )
+        if response is None:
+            return None
+        if as_models:
+            return await self._decode(
+                await response.read(),
+                decode_models,
+                "values",
+                ValueHistory,
+                parse and self._parse_dates,
+            )
+        keys = self._date_keys("validFrom", "validTo") if parse else ()
+        return await self._decode(await response.read(), decode_history, *keys)
+
+    def _parse_history(self, values: list) -> list:
+        """Convert validFrom and validTo of a history page to datetime"""
+        if self._parse_dates:
+            for value in values:
+                parse_dates(value["history"], "validFrom", "validTo")
+        return values
+
+    async def sync_history(
+        self,
+        store: "HistoryStore",
+        unit_guid: str,
+        value_guids: str,
+        _from: str | None = None,
+    ) -> int:
+        """Download the history that is missing in the local store
+
+        The history is requested from the day before the last stored entry (for the
+        value stored least recently, one day earlier as the API may read the dates in
+        the local time of the unit), the overlapping entries are replaced in the store.
+        The store is read and written in a thread of the default executor.
+
+        Parameters:
+        -----------
+        store: `HistoryStore`
+            local history store
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        value_guids: str
+            list of the value guids separated by comma
+        _from: `str` in format 'MM/DD/YYYY', optional
+            history start date, if some of the values are not stored yet
+
+        Returns:
+        --------
+        number of stored entries
+        """
+        value_guids = ",".join(guid.strip() for guid in value_guids.split(","))
+        loop = asyncio.get_running_loop()
+        last = [
+            await loop.run_in_executor(None, store.last_valid_to, unit_guid, value_guid)
+            for value_guid in value_guids.split(",")
+        ]
+        if None not in last:
+            _from = (min(last) - timedelta(days=1)).strftime(DATE_FORMAT)
+        count = 0
+        async for page in self.iter_history(unit_guid, _from, None, value_guids):
+            count += await loop.run_in_executor(None, store.add_page, unit_guid, page)
+        return count
+
+    async def files(
+        self, unit_guid: str, coalesce: bool = True, as_models: bool = False
+    ) -> list:
+        """Get Genset files
+
+        Parameters:
+        -----------
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        coalesce: bool, optional
+            concurrent calls for the same unit share one request (each caller gets
+            its own copy of the files)
+        as_models: bool, optional
+            return `FileInfo` models instead of `dict` (see `comap.models`)
+
         Returns:
         --------
         `list` of `dict`:
@@ -435,18 +1699,35 @@ class WSV(ComApCloud):
             'generated': `datetime`
         }]
         """
-        response = await self.get_api(
-            application=WSV_URL, api="files", unit_guid=unit_guid
+        response_json = await self.get_json(
+            application=WSV_URL,
+            api="files",
+            unit_guid=unit_guid,
+            coalesce=coalesce,
+            items="files",
+            model=FileInfo if as_models else None,
         )
-        response_json = {"files": []} if response is None else await response.json()
-        files = response_json["files"]
-        for file in files:
-            file["generated"] = datetime.fromisoformat(file["generated"])
+        files = [] if response_json is None else response_json["files"]
+        # the shared response is not modified, each caller gets its own list
+        files = [copy(file) for file in files]
+        if as_models:
+            return files
+        if self._parse_dates:
+            parse_dates(files, "generated")
         return files
 
-    async def download(self, unit_guid: str, file_name: str, path: str = "") -> bool:
+    async def download(
+        self,
+        unit_guid: str,
+        file_name: str,
+        path: str = "",
+        chunk_size: int = CHUNK_SIZE,
+        resume: bool = False,
+    ) -> bool:
         """Download a file with 'file_name', store it in the 'path'
 
+        The file is streamed in chunks to '<file_name>.part' and renamed when complete.
+
         Parameters:
         -----------
         unit_guid: str
@@ -455,29 +1736,220 @@ class WSV(ComApCloud):
             List names by calling `files`
         path: str, optional
             Local directory to save the file (current directory if not specified)
+        chunk_size: int, optional
+            Size of the chunks written to the disk (in bytes)
+        resume: bool, optional
+            Continue a partial download left over by a previous failed attempt
+            (a complete '.part' file is renamed when the server responds 416)
 
         Returns:
         --------
         `bool`: Was the download succesful?
         """
-
+        import aiofiles
+        import aiofiles.os
+
+        file_path = os.path.join(path, file_name)
+        part_path = file_path + ".part"
+        offset = (
+            await aiofiles.os.path.getsize(part_path)
+            if resume and await aiofiles.os.path.exists(part_path)
+            else 0
+        )
         response = await self.get_api(
             application=WSV_URL,
             api="download",
             unit_guid=unit_guid,
             file_name=file_name,
+            headers=None if offset == 0 else {"Range": f"bytes={offset}-"},
+            stream=True,
         )
         if response is None:
             return False
+        if response.status == 416:
+            response.release()
+            self._report_stream(response, 0)
+            if _complete(response, offset):
+                await aiofiles.os.replace(part_path, file_path)
+                return True
+            # the file changed on the server, start again
+            await aiofiles.os.remove(part_path)
+            return await self.download(unit_guid, file_name, path, chunk_size)
+        if response.status != 206:
+            offset = 0
+        size = 0
+        started = time.monotonic()
         try:
-            f = await aiofiles.open(os.path.join(path, file_name), mode="wb")
-            await f.write(await response.read())
-            await f.close()
+            async with aiofiles.open(part_path, mode="ab" if offset else "wb") as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    await f.write(chunk)
+                    size += len(chunk)
+            await aiofiles.os.replace(part_path, file_path)
         except Exception as e:
             _LOGGER.error(f"API 'download' error {e}")
+            if not resume and await aiofiles.os.path.exists(part_path):
+                await aiofiles.os.remove(part_path)
             return False
+        finally:
+            response.release()
+            self._report_stream(response, size)
+        elapsed = time.monotonic() - started
+        _LOGGER.debug(
+            "Downloaded '%s' (%d bytes) in %.2f s (%.0f bytes/s)",
+            file_name,
+            size,
+            elapsed,
+            size / elapsed if elapsed > 0 else 0,
+        )
         return True
 
+    async def download_many(
+        self,
+        files: Iterable[tuple[str, str]],
+        path: str = "",
+        concurrency: int = CONCURRENCY,
+        resume: bool = False,
+    ) -> dict:
+        """Download multiple files concurrently
+
+        The files are stored in a subdirectory '<path>/<unit_guid>' of each unit
+        (the same layout as `sync_files`).
+
+        Parameters:
+        -----------
+        files: `Iterable` of `tuple`
+            (unit_guid, file_name) of the files to download
+        path: str, optional
+            Local directory to save the files (current directory if not specified)
+        concurrency: int, optional
+            maximum number of downloads at once
+        resume: bool, optional
+            Continue partial downloads left over by a previous failed attempt
+
+        Returns:
+        --------
+        `dict` of `bool` - was the download succesful? by (unit_guid, file_name)
+        """
+        import aiofiles.os
+
+        files = list(files)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(unit_guid: str, file_name: str) -> bool:
+            unit_dir = os.path.join(path, unit_guid)
+            await aiofiles.os.makedirs(unit_dir, exist_ok=True)
+            async with semaphore:
+                return await self.download(
+                    unit_guid, file_name, unit_dir, resume=resume
+                )
+
+        results = await asyncio.gather(
+            *(fetch(unit_guid, file_name) for unit_guid, file_name in files)
+        )
+        return dict(zip(files, results))
+
+    async def sync_files(
+        self,
+        unit_guids: Iterable[str],
+        dest_dir: str,
+        concurrency: int = CONCURRENCY,
+    ) -> dict:
+        """Download new and changed files of multiple Gensets
+
+        Each unit has its own subdirectory '<dest_dir>/<unit_guid>' with a manifest
+        of the downloaded files (fileName, generated, size). Files that are in
+        the manifest with the same 'generated' timestamp and are present on the disk
+        with the same size are not downloaded again.
+
+        Parameters:
+        -----------
+        unit_guids: `Iterable` of `str`
+            the genset IDs (from the `units` API, or in WSV application front-end)
+        dest_dir: str
+            Local directory to save the files
+        concurrency: int, optional
+            maximum number of requests in flight
+
+        Returns:
+        --------
+        Summary `dict`:
+        {
+            'downloaded': `number`,
+            'skipped': `number`,
+            'failed': `number`,
+            'bytes': `number` # size of the downloaded files
+        }
+        """
+        import aiofiles.os
+
+        semaphore = asyncio.Semaphore(concurrency)
+        summary = {"downloaded": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+        async def sync_file(unit_guid: str, unit_dir: str, manifest: dict, file):
+            file_name = file["fileName"]
+            file_path = os.path.join(unit_dir, file_name)
+            generated = parse_timestamp(file["generated"]).isoformat()
+            entry = manifest.get(file_name)
+            if (
+                entry is not None
+                and entry["generated"] == generated
+                and await aiofiles.os.path.exists(file_path)
+                and await aiofiles.os.path.getsize(file_path) == entry["size"]
+            ):
+                summary["skipped"] += 1
+                return
+            async with semaphore:
+                downloaded = await self.download(unit_guid, file_name, unit_dir)
+            if not downloaded:
+                summary["failed"] += 1
+                return
+            size = await aiofiles.os.path.getsize(file_path)
+            manifest[file_name] = {"generated": generated, "size": size}
+            summary["downloaded"] += 1
+            summary["bytes"] += size
+
+        async def sync_unit(unit_guid: str) -> None:
+            unit_dir = os.path.join(dest_dir, unit_guid)
+            await aiofiles.os.makedirs(unit_dir, exist_ok=True)
+            manifest = await self._read_manifest(unit_dir)
+            async with semaphore:
+                files = await self.files(unit_guid)
+            await asyncio.gather(
+                *(sync_file(unit_guid, unit_dir, manifest, file) for file in files)
+            )
+            await self._write_manifest(unit_dir, manifest)
+
+        await asyncio.gather(*(sync_unit(unit_guid) for unit_guid in unit_guids))
+        return summary
+
+    @staticmethod
+    async def _read_manifest(unit_dir: str) -> dict:
+        """Read the manifest of downloaded files, empty if not available"""
+        import aiofiles
+
+        try:
+            async with aiofiles.open(os.path.join(unit_dir, FILES_MANIFEST)) as f:
+                return json.loads(await f.read())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            _LOGGER.error("Cannot read the manifest in '%s': %s", unit_dir, e)
+            return {}
+
+    @staticmethod
+    async def _write_manifest(unit_dir: str, manifest: dict) -> None:
+        """Replace the manifest of downloaded files"""
+        import aiofiles
+        import aiofiles.os
+
+        manifest_path = os.path.join(unit_dir, FILES_MANIFEST)
+        try:
+            async with aiofiles.open(manifest_path + ".part", mode="w") as f:
+                await f.write(json.dumps(manifest, indent=2))
+            await aiofiles.os.replace(manifest_path + ".part", manifest_path)
+        except Exception as e:
+            _LOGGER.error("Cannot write the manifest in '%s': %s", unit_dir, e)
+
     async def command(
         self, unit_guid: str, command: str, mode: str | None = None
     ) -> dict:
@@ -503,28 +1975,39 @@ class WSV(ComApCloud):
         response = await self.post_api(
             application=WSV_URL, api="command", unit_guid=unit_guid, payload=body
         )
-        return {} if response is None else await response.json()
+        return {} if response is None else loads(await response.read())
 
-    async def get_unit_guid(self, name: str) -> str | None:
-        """Call units API and find GUID for a unit by name
+    async def get_unit_guid(self, name: str, exact: bool = False) -> str | None:
+        """Find GUID for a unit by name
+
+        The units are cached, so the units API is called only when the cache expires.
 
         Parameters:
         -----------
         name: str
             Name of the unit
+        exact: bool, optional
+            Match the whole name (otherwise the first unit containing `name` is returned)
 
         Returns:
         --------
         unitGuid (`str`) or `None`
         """
-        unit = next(
-            (unit for unit in await self.units() if unit["name"].find(name) >= 0),
-            None,
-        )
-        return None if unit is None else unit["unitGuid"]
-
-    async def get_value_guid(self, unit_guid: str, name: str) -> str | None:
-        """Call values API and find GUID for a value by name
+        index = self._cache.get("units")
+        if index is None:
+            units = await self.units()
+            index = NameIndex(units, "unitGuid")
+            if units:
+                self._cache.set("units", index)
+        return index.find(name, exact)
+
+    async def get_value_guid(
+        self, unit_guid: str, name: str, exact: bool = False
+    ) -> str | None:
+        """Find GUID for a value by name
+
+        The catalog of the unit values is cached, so the values API is called
+        only when the cache expires.
 
         Parameters:
         -----------
@@ -532,18 +2015,618 @@ class WSV(ComApCloud):
             the genset ID (from the `units` API, or in WSV application front-end)
         name: str
             Name of the value
+        exact: bool, optional
+            Match the whole name (otherwise the first value containing `name` is returned)
 
         Returns:
         --------
         valueGuid (`str`) or `None`
 
         """
-        value = next(
-            (
-                value
-                for value in await self.values(unit_guid)
-                if value["name"].find(name) >= 0
-            ),
-            None,
+        index = self._cache.get(("values", unit_guid))
+        if index is None:
+            values = await self.values(unit_guid)
+            index = NameIndex(values, "valueGuid")
+            if values:
+                self._cache.set(("values", unit_guid), index)
+        return index.find(name, exact)
+
+    def clear_cache(self) -> None:
+        """Forget the cached units and value catalogs"""
+        self._cache.clear()
+
+
+class ValuePoller:
+    """Poll values of multiple units and report only the changed values"""
+
+    def __init__(
+        self,
+        wsv: WSV,
+        interval: float = POLL_INTERVAL,
+        jitter: float = POLL_JITTER,
+        compare_timestamp: bool = False,
+    ) -> None:
+        """Setup of the poller
+
+        Parameters:
+        -----------
+        wsv: `WSV`
+            ComAp Cloud WSV API instance
+        interval: `float`, optional
+            default time between two polls of a unit (in seconds)
+        jitter: `float`, optional
+            random variation of the interval (0.1 = +/- 10%), so that the units
+            are not polled at the same time
+        compare_timestamp: `bool`, optional
+            report a value also if only its 'timeStamp' changed
+        """
+        self._wsv = wsv
+        self._interval = interval
+        self._jitter = jitter
+        self._compare_timestamp = compare_timestamp
+        self._units = {}
+        self._snapshots = {}
+
+    def add_unit(
+        self,
+        unit_guid: str,
+        value_guids: str | None = None,
+        interval: float | None = None,
+    ) -> None:
+        """Add a unit to poll (before starting `changes` or `run`)
+
+        Parameters:
+        -----------
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        value_guids: str, optional
+            list of the value guids separated by comma (all values if not specified)
+        interval: float, optional
+            time between two polls of this unit (in seconds)
+        """
+        self._units[unit_guid] = (
+            value_guids,
+            self._interval if interval is None else interval,
+        )
+
+    def remove_unit(self, unit_guid: str) -> None:
+        """Stop polling a unit and forget its values"""
+        self._units.pop(unit_guid, None)
+        self._snapshots.pop(unit_guid, None)
+
+    def snapshot(self, unit_guid: str) -> dict:
+        """Return the last known values of a unit
+
+        Returns:
+        --------
+        `dict` of values (see `WSV.values`) by valueGuid
+        """
+        return dict(self._snapshots.get(unit_guid, {}))
+
+    async def poll(self, unit_guid: str) -> list:
+        """Poll a unit once and return the changed values
+
+        All values are reported on the first poll of the unit.
+
+        Returns:
+        --------
+        `list` of `dict` - changed values (see `WSV.values`)
+        """
+        value_guids, _ = self._units.get(unit_guid, (None, None))
+        values = await self._wsv.values(unit_guid, value_guids)
+        snapshot = self._snapshots.setdefault(unit_guid, {})
+        changes = []
+        for value in values:
+            previous = snapshot.get(value["valueGuid"])
+            if (
+                previous is None
+                or previous["value"] != value["value"]
+                or (
+                    self._compare_timestamp
+                    and previous["timeStamp"] != value["timeStamp"]
+                )
+            ):
+                changes.append(value)
+            snapshot[value["valueGuid"]] = value
+        return changes
+
+    async def changes(self) -> AsyncIterator[tuple[str, list]]:
+        """Poll all units until the iteration is stopped, yield the changes
+
+        Yields:
+        -------
+        `tuple` (unitGuid, `list` of changed values)
+        """
+        queue = asyncio.Queue()
+        tasks = [
+            asyncio.ensure_future(self._poll_unit(unit_guid, queue))
+            for unit_guid in self._units
+        ]
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, callback: Callable[[str, list], Any]) -> None:
+        """Poll all units until cancelled, call `callback(unit_guid, changes)`
+
+        The callback can be a function or a coroutine function.
+        """
+        async with aclosing(self.changes()) as changes:
+            async for unit_guid, values in changes:
+                result = callback(unit_guid, values)
+                if inspect.isawaitable(result):
+                    await result
+
+    async def _poll_unit(self, unit_guid: str, queue: asyncio.Queue) -> None:
+        """Poll one unit in a loop"""
+        _, interval = self._units[unit_guid]
+        await asyncio.sleep(random.uniform(0, interval * self._jitter))
+        while unit_guid in self._units:
+            try:
+                changes = await self.poll(unit_guid)
+            except Exception as e:
+                _LOGGER.error("Polling unit %s error %s", unit_guid, e)
+                changes = []
+            if changes:
+                await queue.put((unit_guid, changes))
+            await asyncio.sleep(
+                interval * random.uniform(1 - self._jitter, 1 + self._jitter)
+            )
+
+
+class Subscription:
+    """Values of one unit delivered by the `SubscriptionHub`"""
+
+    def __init__(
+        self,
+        hub: "SubscriptionHub",
+        unit_guid: str,
+        value_guids: str | None,
+        queue_size: int,
+        overflow: str,
+    ) -> None:
+        """Created by `SubscriptionHub.subscribe`"""
+        if overflow not in SUBSCRIPTION_OVERFLOW:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self._hub = hub
+        self.unit_guid = unit_guid
+        # the API does not keep the case of the GUIDs
+        self.value_guids = (
+            None
+            if value_guids is None
+            else frozenset(guid.strip().lower() for guid in value_guids.split(","))
+        )
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = asyncio.Queue(queue_size)
+        self._pending = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        """`True` after `close`"""
+        return self._closed
+
+    @property
+    def ready(self) -> bool:
+        """`False` while a poll waits for the space in the queue ('block' policy)"""
+        return self._pending is None or self._pending.done()
+
+    async def get(self) -> list:
+        """Wait for the next values
+
+        Raises `StopAsyncIteration` when the subscription is closed.
+
+        Returns:
+        --------
+        `list` of `dict` - values of the unit (see `WSV.values`)
+        """
+        if self._closed:
+            raise StopAsyncIteration
+        values = await self._queue.get()
+        if values is _CLOSED:
+            # wake up the next consumer waiting in `get`
+            self._queue.put_nowait(_CLOSED)
+            raise StopAsyncIteration
+        return values
+
+    def close(self) -> None:
+        """Stop receiving the values"""
+        if self._closed:
+            return
+        self._closed = True
+        self._hub.unsubscribe(self)
+        if self._pending is not None:
+            self._pending.cancel()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(_CLOSED)
+
+    def _put(self, values: list) -> None:
+        """Queue the values without holding up the hub, apply the overflow policy"""
+        if self._closed:
+            return
+        if not self._queue.full():
+            self._queue.put_nowait(values)
+        elif self.overflow == "drop_oldest":
+            self._queue.get_nowait()
+            self._queue.put_nowait(values)
+            self.dropped += 1
+        elif self.overflow == "drop_newest":
+            self.dropped += 1
+        else:
+            # delivered when the consumer takes the values, until then the
+            # subscription is left out of the polls
+            self._pending = asyncio.ensure_future(self._queue.put(values))
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> list:
+        return await self.get()
+
+
+class SubscriptionHub:
+    """Poll the values for multiple consumers with one API call per unit"""
+
+    def __init__(
+        self,
+        wsv: WSV,
+        interval: float = POLL_INTERVAL,
+        queue_size: int = SUBSCRIPTION_QUEUE_SIZE,
+        overflow: str = "drop_oldest",
+        concurrency: int = CONCURRENCY,
+    ) -> None:
+        """Setup of the hub
+
+        A slow consumer never holds up the polling and the other subscriptions.
+        When its queue is full, the `overflow` policy applies:
+
+        - 'drop_oldest' - the oldest queued poll is dropped (the consumer gets
+          the latest values)
+        - 'drop_newest' - the new poll is dropped
+        - 'block'       - the new poll waits for the space in the queue, and the
+          subscription is left out of the next polls until it is delivered
+          (no values are lost, the consumer slows down its own polling)
+
+        The dropped polls are counted in `Subscription.dropped`.
+
+        Parameters:
+        -----------
+        wsv: `WSV`
+            ComAp Cloud WSV API instance
+        interval: `float`, optional
+            time between two polls (in seconds)
+        queue_size: `int`, optional
+            default number of polls waiting in each subscription
+        overflow: `str`, optional
+            default policy when a subscription queue is full
+            ('drop_oldest', 'drop_newest' or 'block')
+        concurrency: `int`, optional
+            maximum number of `values` requests in flight in one poll
+        """
+        if overflow not in SUBSCRIPTION_OVERFLOW:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self._wsv = wsv
+        self._interval = interval
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._concurrency = concurrency
+        self._subscriptions = {}
+
+    def subscribe(
+        self,
+        unit_guid: str,
+        value_guids: str | None = None,
+        queue_size: int | None = None,
+        overflow: str | None = None,
+    ) -> Subscription:
+        """Subscribe to the values of a unit
+
+        Parameters:
+        -----------
+        unit_guid: str
+            the genset ID (from the `units` API, or in WSV application front-end)
+        value_guids: str, optional
+            list of the value guids separated by comma (all values if not specified)
+        queue_size: int, optional
+            number of polls waiting in the subscription queue
+        overflow: str, optional
+            policy when the queue is full ('drop_oldest', 'drop_newest' or 'block')
+
+        Returns:
+        --------
+        `Subscription` - iterate it (or call `get`) to receive the values
+        """
+        subscription = Subscription(
+            self,
+            unit_guid,
+            value_guids,
+            self._queue_size if queue_size is None else queue_size,
+            self._overflow if overflow is None else overflow,
         )
-        return None if value is None else value["valueGuid"]
+        self._subscriptions.setdefault(unit_guid, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove the subscription"""
+        subscriptions = self._subscriptions.get(subscription.unit_guid, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if not subscriptions:
+            self._subscriptions.pop(subscription.unit_guid, None)
+
+    def requests(self) -> dict:
+        """Merge the subscriptions into the API calls of one poll
+
+        The subscriptions waiting for the space in their queue are left out.
+
+        Returns:
+        --------
+        `dict` - value_guids (separated by comma, `None` for all values) by unitGuid
+        """
+        requests = {}
+        for unit_guid, subscriptions in self._subscriptions.items():
+            ready = [
+                subscription for subscription in subscriptions if subscription.ready
+            ]
+            if not ready:
+                continue
+            value_guids = set()
+            for subscription in ready:
+                if subscription.value_guids is None:
+                    value_guids = None
+                    break
+                value_guids |= subscription.value_guids
+            requests[unit_guid] = (
+                None if value_guids is None else ",".join(sorted(value_guids))
+            )
+        return requests
+
+    async def poll(self) -> None:
+        """Call the values API once per unit and pass the values to the subscriptions"""
+        requests = self.requests()
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def fetch(unit_guid: str, value_guids: str | None) -> list:
+            async with semaphore:
+                return await self._wsv.values(unit_guid, value_guids)
+
+        results = await asyncio.gather(
+            *(
+                fetch(unit_guid, value_guids)
+                for unit_guid, value_guids in requests.items()
+            )
+        )
+        for unit_guid, values in zip(requests, results):
+            if not values:
+                continue
+            for subscription in list(self._subscriptions.get(unit_guid, [])):
+                if not subscription.ready:
+                    continue
+                selected = values
+                if subscription.value_guids is not None:
+                    selected = [
+                        value
+                        for value in values
+                        if value["valueGuid"].lower() in subscription.value_guids
+                    ]
+                subscription._put(selected)
+
+    async def run(self) -> None:
+        """Poll in the interval until cancelled"""
+        while True:
+            started = time.monotonic()
+            await self.poll()
+            await asyncio.sleep(max(0, self._interval - (time.monotonic() - started)))
+
+
+class WSVPool:
+    """WSV APIs of multiple tenants sharing one HTTPS session and request budget"""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        concurrency: int = CONCURRENCY,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+        cache_ttl: float = CACHE_TTL,
+        cache_size: int = CACHE_SIZE,
+        parse_dates: bool = True,
+    ) -> None:
+        """Setup of the pool
+
+        Parameters:
+        -----------
+        session: `aiohttp.ClientSession`
+            HTTPS connection pool instance shared by all tenants
+            (limit its connector to `concurrency` connections)
+        concurrency: `int`, optional
+            maximum number of requests in flight of all tenants
+        rate_limiter: `RateLimiter`, optional
+            limit of the request rate of all tenants
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
+        cache_ttl: `float`, optional
+            time (in seconds) to cache the units and value catalogs of each tenant
+        cache_size: `int`, optional
+            maximum number of cached units and value catalogs of each tenant
+        parse_dates: `bool`, optional
+            convert the timestamps in the results to `datetime`
+        """
+        self._session = session
+        self._concurrency = concurrency
+        self._scheduler = FairScheduler(concurrency, rate_limiter)
+        self._retry_policy = retry_policy
+        self._metrics = metrics
+        self._cache_ttl = cache_ttl
+        self._cache_size = cache_size
+        self._parse_dates = parse_dates
+        self._tenants = {}
+
+    @property
+    def tenants(self) -> list:
+        """Names of the tenants"""
+        return list(self._tenants)
+
+    def __getitem__(self, tenant: str) -> WSV:
+        return self._tenants[tenant]
+
+    def add_tenant(
+        self,
+        tenant: str,
+        login_id: str,
+        key: str,
+        client_id: str | None = None,
+        secret: str | None = None,
+        token: str | None = None,
+    ) -> WSV:
+        """Add a tenant, with the client secret or with a token
+
+        Parameters:
+        -----------
+        tenant: `str`
+            name of the tenant
+        login_id: `str`
+            the user name of the tenant
+        key: `str`
+            ComAp Key of the tenant
+        client_id: `str`, optional
+            Client ID of the tenant - the token is obtained and refreshed automatically
+        secret: `str`, optional
+            Secret of the tenant
+        token: `str`, optional
+            Bearer token, if `client_id` and `secret` are not specified
+
+        Returns:
+        --------
+        `WSV` of the tenant
+        """
+        if tenant in self._tenants:
+            raise ValueError(f"Tenant '{tenant}' already exists")
+        limiter = self._scheduler.limiter(tenant)
+        if token is None:
+            if client_id is None or secret is None:
+                raise ValueError("Specify the token, or the client_id and secret")
+            identity = Identity(
+                self._session,
+                key,
+                rate_limiter=limiter,
+                retry_policy=self._retry_policy,
+                metrics=self._metrics,
+            )
+            token = TokenProvider(identity, client_id, secret)
+        wsv = WSV(
+            self._session,
+            login_id,
+            key,
+            token,
+            cache_ttl=self._cache_ttl,
+            cache_size=self._cache_size,
+            rate_limiter=limiter,
+            retry_policy=self._retry_policy,
+            metrics=self._metrics,
+            parse_dates=self._parse_dates,
+        )
+        self._tenants[tenant] = wsv
+        return wsv
+
+    def remove_tenant(self, tenant: str) -> None:
+        """Remove the tenant"""
+        self._tenants.pop(tenant, None)
+
+    def stats(self) -> dict:
+        """Return the requests in flight and waiting by tenant (see `FairScheduler.stats`)"""
+        return self._scheduler.stats()
+
+    async def units(self) -> dict:
+        """Get the units of all tenants
+
+        Returns:
+        --------
+        `dict` - units (see `WSV.units`) by tenant
+        """
+        results = await asyncio.gather(*(wsv.units() for wsv in self._tenants.values()))
+        return dict(zip(self._tenants, results))
+
+    async def values_many(
+        self,
+        unit_guids: dict | None = None,
+        value_guids: str | None = None,
+        timeout: float = TIMEOUT,
+    ) -> dict:
+        """Get values of the units of all tenants concurrently
+
+        Parameters:
+        -----------
+        unit_guids: `dict`, optional
+            `Iterable` of the genset IDs by tenant (all units of all tenants if not specified)
+        value_guids: str, optional
+            list of the value guids separated by comma
+        timeout: float, optional
+            time limit for each unit (in seconds)
+
+        Returns:
+        --------
+        `dict` by tenant of `dict` - values (see `WSV.values`) by unitGuid
+        """
+        unit_guids = await self._unit_guids(unit_guids)
+        results = await asyncio.gather(
+            *(
+                self._tenants[tenant].values_many(
+                    guids, value_guids, self._concurrency, timeout
+                )
+                for tenant, guids in unit_guids.items()
+            )
+        )
+        return dict(zip(unit_guids, results))
+
+    async def history(
+        self,
+        unit_guids: dict | None = None,
+        _from: str | None = None,
+        _to: str | None = None,
+        value_guids: str | None = None,
+    ) -> dict:
+        """Get history of the units of all tenants concurrently
+
+        Parameters:
+        -----------
+        unit_guids: `dict`, optional
+            `Iterable` of the genset IDs by tenant (all units of all tenants if not specified)
+        _from: `str` in format 'MM/DD/YYYY', optional
+            history start date
+        _to: `str` in format 'MM/DD/YYYY', optional
+            history end date
+        value_guids: `list`, optional
+            list of the value guids separated by comma
+
+        Returns:
+        --------
+        `dict` by tenant of `dict` - history (see `WSV.history`) by unitGuid
+        """
+        unit_guids = await self._unit_guids(unit_guids)
+        results = await asyncio.gather(
+            *(
+                self._tenants[tenant].history_many(
+                    guids, _from, _to, value_guids, self._concurrency
+                )
+                for tenant, guids in unit_guids.items()
+            )
+        )
+        return dict(zip(unit_guids, results))
+
+    async def _unit_guids(self, unit_guids: dict | None) -> dict:
+        """The requested unit guids by tenant, all units if not specified"""
+        if unit_guids is not None:
+            return unit_guids
+        return {
+            tenant: [unit["unitGuid"] for unit in units]
+            for tenant, units in (await self.units()).items()
+        }
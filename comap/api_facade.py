@@ -0,0 +1,321 @@
+"""comap.api_facade module
+
+Synchronous facade over `comap.api_async`, for code that cannot be rewritten as coroutines.
+
+The async classes run in an event loop in a background thread, the methods of the facade
+block until the result is available. Unlike `comap.api`, the batch methods (`values_many`,
+`history_many`, `download_many`, `sync_files`...) run the requests concurrently,
+over pooled aiohttp connections.
+
+- BackgroundLoop - event loop running in a background thread, with a shared HTTPS session
+- Identity       - `comap.api_async.Identity` with blocking methods
+- TokenProvider  - `comap.api_async.TokenProvider` for the facade `WSV`
+- WSV            - `comap.api_async.WSV` with blocking methods
+
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from collections.abc import AsyncIterator, Coroutine, Iterator
+from concurrent.futures import Executor
+from typing import Any
+
+import aiohttp
+
+from . import api_async
+from .cache import ResponseCache
+from .constants import CACHE_SIZE, CACHE_TTL, OFFLOAD_SIZE, TOKEN_REFRESH_MARGIN
+from .metrics import Metrics
+from .retry import RetryPolicy
+
+
+async def _create(factory, *args, **kwargs) -> Any:
+    """Create the instance inside the running event loop"""
+    return factory(*args, **kwargs)
+
+
+class BackgroundLoop:
+    """Event loop running in a daemon thread
+
+    Share one instance by all facade instances, so they share the connection pool
+    (and a `comap.api_async.RateLimiter`, if used).
+    """
+
+    def __init__(self, limit: int = 100) -> None:
+        """Start the event loop thread
+
+        Parameters:
+        -----------
+        limit: `int`, optional
+            maximum number of connections of the shared HTTPS session
+        """
+        self._limit = limit
+        self._session = None
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="comap-loop", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The event loop running in the background thread"""
+        return self._loop
+
+    def run(self, coroutine: Coroutine, timeout: float | None = None) -> Any:
+        """Run the coroutine in the background loop and wait for the result"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BackgroundLoop.run called from the event loop thread")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, iterator: AsyncIterator) -> Iterator:
+        """Iterate the async iterator from the calling thread"""
+        try:
+            while True:
+                try:
+                    yield self.run(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if hasattr(iterator, "aclose") and not self._loop.is_closed():
+                self.run(iterator.aclose())
+
+    def session(self) -> aiohttp.ClientSession:
+        """The shared HTTPS session (created on the first call)"""
+        with self._lock:
+            if self._session is None:
+                self._session = self.run(self._create_session())
+            return self._session
+
+    async def _create_session(self) -> aiohttp.ClientSession:
+        """Create the session (and its connector) inside the event loop"""
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+
+    def close(self) -> None:
+        """Close the session and stop the event loop"""
+        if self._loop.is_closed():
+            return
+        with self._lock:
+            if self._session is not None:
+                self.run(self._session.close())
+                self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "BackgroundLoop":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class _Facade:
+    """Blocking proxy of an async instance running in the `BackgroundLoop`
+
+    The coroutine methods of the async instance block until the result is available,
+    the async generators are turned into regular iterators.
+    """
+
+    def __init__(self, loop: BackgroundLoop | None) -> None:
+        self._owns_loop = loop is None
+        self._loop = BackgroundLoop() if loop is None else loop
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attribute = getattr(self._async, name)
+        if inspect.iscoroutinefunction(attribute):
+
+            @functools.wraps(attribute)
+            def method(*args, **kwargs) -> Any:
+                return self._loop.run(attribute(*args, **kwargs))
+
+            return method
+        if inspect.isasyncgenfunction(attribute):
+
+            @functools.wraps(attribute)
+            def generator(*args, **kwargs) -> Iterator:
+                return self._loop.iterate(attribute(*args, **kwargs))
+
+            return generator
+        return attribute
+
+    def close(self) -> None:
+        """Stop the event loop, if it was created by this instance"""
+        if self._owns_loop:
+            self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class Identity(_Facade):
+    """ComAp Cloud Identity API running on `comap.api_async`"""
+
+    def __init__(
+        self,
+        key: str,
+        loop: BackgroundLoop | None = None,
+        rate_limiter: api_async.RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
+        """Setup of the ComAp Cloud Identity API class
+
+        Parameters:
+        -----------
+        key: `str`
+            ComAp Key (from the API profile)
+        loop: `BackgroundLoop`, optional
+            the event loop (a new one is started and stopped on `close` if not specified)
+        rate_limiter: `comap.api_async.RateLimiter`, optional
+            limit of the request rate (can be shared with other instances on the same loop)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
+        """
+        super().__init__(loop)
+        self._async = self._loop.run(
+            _create(
+                api_async.Identity,
+                self._loop.session(),
+                key,
+                rate_limiter=rate_limiter,
+                retry_policy=retry_policy,
+                metrics=metrics,
+            )
+        )
+
+
+class TokenProvider:
+    """Keep the Bearer token of the facade `WSV` up to date (see `comap.api_async.TokenProvider`)"""
+
+    def __init__(
+        self,
+        identity: Identity,
+        client_id: str,
+        secret: str,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+    ) -> None:
+        """Setup of the token provider
+
+        Parameters:
+        -----------
+        identity: `Identity`
+            the facade Identity API instance
+        client_id: `str`
+            Client ID (from the API profile)
+        secret: `str`
+            Secret (from the API profile)
+        refresh_margin: `float`, optional
+            refresh the token this many seconds before it expires
+        """
+        self._loop = identity._loop
+        self._async = self._loop.run(
+            _create(
+                api_async.TokenProvider,
+                identity._async,
+                client_id,
+                secret,
+                refresh_margin,
+            )
+        )
+
+    def token(self) -> str | None:
+        """Return a valid token, authenticate if needed"""
+        return self._loop.run(self._async.token())
+
+
+class WSV(_Facade):
+    """ComAp Cloud WSV API running on `comap.api_async`
+
+    Has all the methods of `comap.api_async.WSV` (blocking), including the concurrent
+    `values_many`, `history_many`, `download_many` and `sync_files`.
+    """
+
+    def __init__(
+        self,
+        login_id: str,
+        key: str,
+        token: str | TokenProvider,
+        loop: BackgroundLoop | None = None,
+        cache_ttl: float = CACHE_TTL,
+        cache_size: int = CACHE_SIZE,
+        rate_limiter: api_async.RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        metrics: Metrics | None = None,
+        parse_dates: bool = True,
+        executor: Executor | None = None,
+        offload_size: int = OFFLOAD_SIZE,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
+        """Setup of the ComAp Cloud WSV API class
+
+        Parameters:
+        -----------
+        login_id: `str`
+            the user name (each identity can have multiple user names)
+        key: `str`
+            ComAp Key (from the API profile)
+        token: `str` or `TokenProvider`
+            The Bearer token received from Identity API authenticate,
+            or the facade provider refreshing the token before it expires
+        loop: `BackgroundLoop`, optional
+            the event loop (a new one is started and stopped on `close` if not specified).
+            The `TokenProvider` must use the same loop.
+        cache_ttl: `float`, optional
+            time (in seconds) to cache the units and value catalogs used to find GUIDs by name
+        cache_size: `int`, optional
+            maximum number of cached units and value catalogs
+        rate_limiter: `comap.api_async.RateLimiter`, optional
+            limit of the request rate (can be shared with other instances on the same loop)
+        retry_policy: `RetryPolicy`, optional
+            repeat requests that failed due to transient errors
+        metrics: `Metrics`, optional
+            hooks called at the start and the end of each request
+        parse_dates: `bool`, optional
+            convert the timestamps in the results to `datetime`. If disabled,
+            the timestamps are kept as ISO 8601 strings (faster)
+        executor: `concurrent.futures.Executor`, optional
+            thread or process pool decoding the large responses
+        offload_size: `int`, optional
+            responses of at least this size (in bytes) are decoded in the `executor`
+        response_cache: `ResponseCache`, optional
+            cache of the metadata responses validated by ETag / Last-Modified
+        """
+        if isinstance(token, TokenProvider):
+            if loop is None:
+                loop = token._loop
+            elif loop is not token._loop:
+                raise ValueError("The TokenProvider must use the same BackgroundLoop")
+        super().__init__(loop)
+        self._async = self._loop.run(
+            _create(
+                api_async.WSV,
+                self._loop.session(),
+                login_id,
+                key,
+                token._async if isinstance(token, TokenProvider) else token,
+                cache_ttl=cache_ttl,
+                cache_size=cache_size,
+                rate_limiter=rate_limiter,
+                retry_policy=retry_policy,
+                metrics=metrics,
+                parse_dates=parse_dates,
+                executor=executor,
+                offload_size=offload_size,
+                response_cache=response_cache,
+            )
+        )
@@ -0,0 +1,200 @@
+"""comap.arrays module
+
+Conversion of the API responses to compact NumPy arrays,
+used by both `comap.api` and `comap.api_async`. Requires `numpy`.
+
+- HistoryArrays - collects history pages into typed arrays per value GUID
+- FleetSnapshot - values of multiple units as a unit x signal matrix
+
+"""
+import re
+from datetime import datetime
+
+import numpy as np
+
+_UTC_OFFSET = re.compile(r"(Z|[+-]\d\d:?\d\d)$")
+
+
+class HistoryArrays:
+    """Collect history pages into typed arrays
+
+    The history of each value is stored as:
+    - 'validFrom', 'validTo' - `int64` arrays of epoch nanoseconds (UTC)
+    - 'value' - `float64` array, `NaN` where the value is not a number
+    - 'codes' - `int32` array of indexes to 'categories' for non-numeric values,
+      -1 for numbers
+    - 'categories' - `list` of the distinct non-numeric values
+    """
+
+    def __init__(self) -> None:
+        self._chunks = {}
+        self._categories = {}
+
+    def add_page(self, values: list) -> None:
+        """Convert one page of the history API response (not parsed)
+
+        Parameters:
+        -----------
+        values: `list` of `dict`
+            the 'values' of the history API response
+        """
+        for value in values:
+            history = value["history"]
+            if not history:
+                continue
+            value_guid = value["valueGuid"]
+            categories = self._categories.setdefault(value_guid, {})
+            numbers, codes = _to_numbers(
+                [entry["value"] for entry in history], categories
+            )
+            self._chunks.setdefault(value_guid, []).append(
+                (
+                    _to_epoch_ns([entry["validFrom"] for entry in history]),
+                    _to_epoch_ns([entry["validTo"] for entry in history]),
+                    numbers,
+                    codes,
+                )
+            )
+
+    def result(self) -> dict:
+        """Return the arrays
+
+        Returns:
+        --------
+        `dict` by valueGuid:
+        {
+            'validFrom': `numpy.ndarray` (int64),
+            'validTo': `numpy.ndarray` (int64),
+            'value': `numpy.ndarray` (float64),
+            'codes': `numpy.ndarray` (int32),
+            'categories': `list` of `str`
+        }
+        """
+        result = {}
+        for value_guid, chunks in self._chunks.items():
+            valid_from, valid_to, numbers, codes = zip(*chunks)
+            result[value_guid] = {
+                "validFrom": np.concatenate(valid_from),
+                "validTo": np.concatenate(valid_to),
+                "value": np.concatenate(numbers),
+                "codes": np.concatenate(codes),
+                "categories": list(self._categories[value_guid]),
+            }
+        return result
+
+
+class FleetSnapshot:
+    """Values of multiple units as a unit x signal matrix
+
+    - 'unit_guids', 'signals' - labels of the rows and columns
+    - 'unit_index', 'signal_index' - position of the row / column by label
+    - 'value' - `float64` matrix, `NaN` where the value is missing or not a number
+    - 'codes' - `int32` matrix of indexes to 'categories' of the signal for
+      non-numeric values, -1 otherwise
+    - 'categories' - `dict` of `list` of the distinct non-numeric values by signal
+    - 'timestamp' - `datetime64[ns]` matrix (UTC), `NaT` where the value is missing
+    """
+
+    def __init__(self, unit_guids: list, signals: dict, values: dict) -> None:
+        """Build the matrix
+
+        Parameters:
+        -----------
+        unit_guids: `list` of `str`
+            the genset IDs (rows)
+        signals: `dict`
+            valueGuid by signal name (columns)
+        values: `dict` of `list`
+            the values (see `WSV.values`) by unitGuid
+        """
+        self.unit_guids = list(unit_guids)
+        self.signals = list(signals)
+        self.unit_index = {guid: i for i, guid in enumerate(self.unit_guids)}
+        self.signal_index = {signal: j for j, signal in enumerate(self.signals)}
+        shape = (len(self.unit_guids), len(self.signals))
+        self.value = np.full(shape, np.nan, dtype=np.float64)
+        self.codes = np.full(shape, -1, dtype=np.int32)
+        self.timestamp = np.full(shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+        self.categories = {}
+        # the API does not keep the case of the GUIDs
+        column = {guid.lower(): j for j, guid in enumerate(signals.values())}
+        cells = [([], [], []) for _ in self.signals]
+        for i, unit_guid in enumerate(self.unit_guids):
+            for value in values.get(unit_guid) or []:
+                j = column.get(value["valueGuid"].lower())
+                if j is None:
+                    continue
+                rows, texts, timestamps = cells[j]
+                rows.append(i)
+                texts.append(value["value"])
+                timestamp = value["timeStamp"]
+                timestamps.append(
+                    timestamp if isinstance(timestamp, str) else timestamp.isoformat()
+                )
+        for j, (rows, texts, timestamps) in enumerate(cells):
+            categories = {}
+            if rows:
+                numbers, codes = _to_numbers(texts, categories)
+                self.value[rows, j] = numbers
+                self.codes[rows, j] = codes
+                self.timestamp[rows, j] = _to_epoch_ns(timestamps).view(
+                    "datetime64[ns]"
+                )
+            self.categories[self.signals[j]] = list(categories)
+
+    def column(self, signal: str) -> np.ndarray:
+        """Return the values of the signal of all units"""
+        return self.value[:, self.signal_index[signal]]
+
+    def row(self, unit_guid: str) -> np.ndarray:
+        """Return the values of all signals of the unit"""
+        return self.value[self.unit_index[unit_guid]]
+
+
+def _to_epoch_ns(timestamps: list) -> np.ndarray:
+    """Convert ISO 8601 strings to epoch nanoseconds"""
+    offset = _UTC_OFFSET.search(timestamps[0])
+    suffix = "" if offset is None else offset.group(1)
+    if suffix:
+        # strip the common UTC offset with C-level string operations
+        joined = "\n".join(timestamps)
+        if joined.count(suffix) != len(timestamps):
+            return np.array([_epoch_ns(timestamp) for timestamp in timestamps])
+        timestamps = joined.replace(suffix, "").split("\n")
+    try:
+        epoch_ns = np.array(timestamps, dtype="datetime64[ns]").astype(np.int64)
+    except ValueError:
+        return np.array([_epoch_ns(timestamp) for timestamp in timestamps])
+    if suffix and suffix != "Z":
+        sign = -1 if suffix[0] == "-" else 1
+        minutes = int(suffix[1:3]) * 60 + int(suffix[-2:])
+        epoch_ns -= sign * minutes * 60_000_000_000
+    return epoch_ns
+
+
+def _epoch_ns(timestamp: str) -> int:
+    """Convert one ISO 8601 string (naive means UTC) to epoch nanoseconds"""
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    delta = parsed - datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + (
+        delta.microseconds * 1000
+    )
+
+
+def _to_numbers(values: list, categories: dict) -> tuple:
+    """Convert values to float64, encode the non-numeric ones as categories"""
+    try:
+        numbers = np.array(values, dtype=np.float64)
+        return numbers, np.full(len(values), -1, dtype=np.int32)
+    except (TypeError, ValueError):
+        pass
+    numbers = np.full(len(values), np.nan, dtype=np.float64)
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        try:
+            numbers[i] = float(value)
+        except (TypeError, ValueError):
+            codes[i] = categories.setdefault(value, len(categories))
+    return numbers, codes
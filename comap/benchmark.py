@@ -0,0 +1,544 @@
+"""comap.benchmark module
+
+Measures the throughput of `comap.api` and `comap.api_async` against the local `MockServer`,
+so the performance can be verified without network access.
+
+The mock server runs in a separate process. Each scenario runs in a fresh client process,
+so the reported peak RSS is the memory of that scenario only.
+
+    python -m comap.benchmark --calls 200 --concurrency 20 --latency 0.01
+
+With `--no-pool`, each call opens a new connection, to compare with the connection pool.
+
+    python -m comap.benchmark --clients sync --latency 0 --no-pool
+
+With `--decode`, it measures the decoding of API responses instead - the given
+recorded payloads (JSON files), or payloads generated by the `MockServer`.
+
+    python -m comap.benchmark --decode history.json values.json
+
+With `--executor`, the async client decodes the large responses in a thread or process pool,
+the reported maximum event loop lag shows how long the other requests were blocked.
+
+    python -m comap.benchmark --clients async --scenarios history --history-page-size 5000 --executor process
+
+With `--models`, it compares the memory and the decoding time of a fleet snapshot
+(values of all units) kept as dictionaries and as `comap.models`.
+
+    python -m comap.benchmark --models 1000 --values 20
+
+With `--imports`, it measures the import time of the modules in a fresh interpreter
+(`python -X importtime`), with `--max-import-ms` it fails if any module is slower.
+
+    python -m comap.benchmark --imports comap comap.api_async --max-import-ms 300
+
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import aiohttp
+
+from . import api, api_async
+from .decode import BACKEND, loads, parse_dates
+from .mock import MockServer, patch_urls
+from .models import BACKEND as MODELS, Value, decode_models
+
+SCENARIOS = ("units", "values", "history", "download")
+CLIENTS = ("sync", "async")
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+IMPORT_MODULES = ("comap", "comap.models", "comap.api", "comap.api_async")
+HEAVY_MODULES = ("requests", "aiohttp", "aiofiles", "numpy", "orjson", "msgspec")
+
+
+def _serve(connection, options: dict) -> None:
+    """Run the mock server until the parent process closes the connection"""
+
+    async def serve() -> None:
+        server = MockServer(**options)
+        connection.send(await server.start(patch=False))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, connection.recv)
+        await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except EOFError:
+        pass
+
+
+def _run_scenario(
+    client: str,
+    scenario: str,
+    url: str,
+    calls: int,
+    options: dict,
+    path: str,
+    concurrency: int,
+    executor: str | None,
+    workers: int | None,
+    pooled: bool = True,
+) -> dict:
+    """Run one scenario against the server at `url` (in a fresh process)"""
+    patch_urls(url)
+    if client == "sync":
+        return run_sync(scenario, calls, options, path, pooled)
+    pool = None if executor is None else EXECUTORS[executor](workers)
+    try:
+        return asyncio.run(
+            run_async(scenario, calls, options, path, concurrency, pool, pooled)
+        )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _peak_rss() -> float:
+    """Peak resident memory of this process in MB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def _result(
+    client: str,
+    scenario: str,
+    durations: list,
+    requests: int,
+    elapsed: float,
+    pooled: bool,
+) -> dict:
+    """Summarize the durations of the calls (in seconds)"""
+    durations = sorted(durations)
+    return {
+        "client": client,
+        "scenario": scenario,
+        "pool": "on" if pooled else "off",
+        "calls": len(durations),
+        "requests/s": requests / elapsed,
+        "p50 ms": statistics.median(durations) * 1000,
+        "p99 ms": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000,
+        "peak RSS MB": _peak_rss(),
+    }
+
+
+def run_sync(
+    scenario: str, calls: int, options: dict, path: str, pooled: bool = True
+) -> dict:
+    """Run the scenario with `comap.api`, one call after another
+
+    Without `pooled`, each call opens a new connection (as `requests.get` does).
+    """
+    with api.WSV("benchmark", "key", "token") as wsv:
+        unit_guids = [unit["unitGuid"] for unit in wsv.units()]
+        call = _sync_call(wsv, scenario, path)
+        durations = []
+        started = time.perf_counter()
+        for i in range(calls):
+            call_started = time.perf_counter()
+            if pooled:
+                call(unit_guids[i % len(unit_guids)], i)
+            else:
+                with api.WSV("benchmark", "key", "token") as unpooled:
+                    _sync_call(unpooled, scenario, path)(
+                        unit_guids[i % len(unit_guids)], i
+                    )
+            durations.append(time.perf_counter() - call_started)
+        elapsed = time.perf_counter() - started
+    return _result(
+        "sync",
+        scenario,
+        durations,
+        calls * _requests(scenario, options),
+        elapsed,
+        pooled,
+    )
+
+
+def _sync_call(wsv: api.WSV, scenario: str, path: str):
+    """The API call of the scenario"""
+    if scenario == "units":
+        return lambda unit_guid, i: wsv.units()
+    if scenario == "values":
+        return lambda unit_guid, i: wsv.values(unit_guid)
+    if scenario == "history":
+        return lambda unit_guid, i: wsv.history(unit_guid)
+
+    def download(unit_guid: str, i: int) -> None:
+        wsv.download(unit_guid, f"file_{i}.ail", path)
+        os.remove(os.path.join(path, f"file_{i}.ail"))
+
+    return download
+
+
+async def _loop_lag(lags: list, interval: float = 0.005) -> None:
+    """Measure the delays of the event loop until cancelled"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_async(
+    scenario: str,
+    calls: int,
+    options: dict,
+    path: str,
+    concurrency: int,
+    executor=None,
+    pooled: bool = True,
+) -> dict:
+    """Run the scenario with `comap.api_async`, `concurrency` calls at once
+
+    Without `pooled`, the connections are not kept alive (a new one for each request).
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency, force_close=not pooled)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        wsv = api_async.WSV(session, "benchmark", "key", "token", executor=executor)
+        unit_guids = [unit["unitGuid"] for unit in await wsv.units()]
+        call = _async_call(wsv, scenario, path)
+        semaphore = asyncio.Semaphore(concurrency)
+        durations = []
+        lags = [0.0]
+        monitor = asyncio.ensure_future(_loop_lag(lags))
+
+        async def timed(i: int) -> None:
+            async with semaphore:
+                call_started = time.perf_counter()
+                await call(unit_guids[i % len(unit_guids)], i)
+                durations.append(time.perf_counter() - call_started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(i) for i in range(calls)))
+        elapsed = time.perf_counter() - started
+        monitor.cancel()
+    result = _result(
+        "async",
+        scenario,
+        durations,
+        calls * _requests(scenario, options),
+        elapsed,
+        pooled,
+    )
+    result["max loop lag ms"] = max(lags) * 1000
+    return result
+
+
+def _async_call(wsv: api_async.WSV, scenario: str, path: str):
+    """The API call of the scenario"""
+    if scenario == "units":
+        return lambda unit_guid, i: wsv.units(coalesce=False)
+    if scenario == "values":
+        return lambda unit_guid, i: wsv.values(unit_guid)
+    if scenario == "history":
+        return lambda unit_guid, i: wsv.history(unit_guid)
+
+    async def download(unit_guid: str, i: int) -> None:
+        await wsv.download(unit_guid, f"file_{i}.ail", path)
+        os.remove(os.path.join(path, f"file_{i}.ail"))
+
+    return download
+
+
+def _requests(scenario: str, options: dict) -> int:
+    """Number of HTTP requests of one call"""
+    return options["history_pages"] if scenario == "history" else 1
+
+
+def _parse_document(document: dict) -> dict:
+    """Convert the timestamps of a decoded API response, as `WSV` does"""
+    values = document.get("values", [])
+    if values and "history" in values[0]:
+        for value in values:
+            parse_dates(value["history"], "validFrom", "validTo")
+    else:
+        parse_dates(values, "timeStamp")
+    parse_dates(document.get("comments", []), "date")
+    parse_dates(document.get("files", []), "generated")
+    return document
+
+
+def run_decode(payloads: dict, repeat: int) -> list:
+    """Measure the decoding of the payloads (`bytes` by name)"""
+    decoders = {"json": json.loads}
+    if BACKEND != "json":
+        decoders[BACKEND] = loads
+    results = []
+    for name, payload in payloads.items():
+        for decoder_name, decoder in decoders.items():
+            for dates in (False, True):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    document = decoder(payload)
+                    if dates:
+                        _parse_document(document)
+                elapsed = time.perf_counter() - started
+                results.append(
+                    {
+                        "payload": name,
+                        "KB": len(payload) / 1024,
+                        "decoder": decoder_name,
+                        "parse_dates": dates,
+                        "ms": elapsed / repeat * 1000,
+                    }
+                )
+    return results
+
+
+def _snapshot(payloads: list, as_models: bool) -> list:
+    """Decode the values of all units, as `WSV.values`"""
+    snapshot = []
+    for payload in payloads:
+        if as_models:
+            snapshot.append(decode_models(payload, "values", Value)["values"])
+        else:
+            snapshot.append(parse_dates(loads(payload)["values"], "timeStamp"))
+    return snapshot
+
+
+def run_models(units: int, values: int) -> list:
+    """Compare the fleet snapshot kept as dictionaries and as models"""
+    server = MockServer(values=values)
+    payloads = [json.dumps(server.values_payload()).encode() for _ in range(units)]
+    results = []
+    for as_models in (False, True):
+        started = time.perf_counter()
+        _snapshot(payloads, as_models)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        snapshot = _snapshot(payloads, as_models)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del snapshot
+        results.append(
+            {
+                "snapshot": f"{units} units x {values} values",
+                "results": MODELS if as_models else "dict",
+                "MB": memory / 1024 / 1024,
+                "ms": elapsed * 1000,
+            }
+        )
+    return results
+
+
+def _import_times(module: str) -> dict:
+    """Cumulative import times (in microseconds) by module name, in a fresh interpreter"""
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, (package_dir, env.get("PYTHONPATH")))
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def run_imports(modules: list, runs: int) -> list:
+    """Measure the import time of the modules (the fastest of `runs`)"""
+    results = []
+    for module in modules:
+        measured = [_import_times(module) for _ in range(runs)]
+        results.append(
+            {
+                "module": module,
+                "import ms": min(times[module] for times in measured) / 1000,
+                "heavy imports": ",".join(
+                    name for name in HEAVY_MODULES if name in measured[0]
+                )
+                or "-",
+            }
+        )
+    return results
+
+
+def _print(result: dict) -> None:
+    """Print one result row"""
+    print(
+        " | ".join(
+            f"{key} {value:.4g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items()
+        ),
+        flush=True,
+    )
+
+
+def main(argv: list | None = None) -> list:
+    """Run the benchmark, print and return the results"""
+    parser = argparse.ArgumentParser(
+        prog="python -m comap.benchmark", description=__doc__.splitlines()[2]
+    )
+    parser.add_argument("--calls", type=int, default=200, help="API calls per scenario")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="concurrent calls of the async client",
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--clients", nargs="+", choices=CLIENTS, default=list(CLIENTS))
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="server latency (s)"
+    )
+    parser.add_argument("--units", type=int, default=10)
+    parser.add_argument("--values", type=int, default=20)
+    parser.add_argument("--history-pages", type=int, default=3)
+    parser.add_argument("--history-page-size", type=int, default=100)
+    parser.add_argument("--file-size", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTORS,
+        help="decode the responses of the async client in a thread or process pool",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="number of executor workers"
+    )
+    parser.add_argument(
+        "--no-pool",
+        action="store_true",
+        help="open a new connection for each call (no keep-alive pool), to compare",
+    )
+    parser.add_argument(
+        "--decode",
+        nargs="*",
+        metavar="FILE",
+        help="measure the decoding of recorded payloads (or generated ones)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=100, help="decoding repetitions per payload"
+    )
+    parser.add_argument(
+        "--imports",
+        nargs="*",
+        metavar="MODULE",
+        help="measure the import time of the modules (default: the comap modules)",
+    )
+    parser.add_argument(
+        "--import-runs",
+        type=int,
+        default=5,
+        help="runs per module (the fastest is reported)",
+    )
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        help="fail if importing any of the modules takes longer (in ms)",
+    )
+    parser.add_argument(
+        "--models",
+        type=int,
+        nargs="?",
+        const=1000,
+        metavar="UNITS",
+        help="compare the memory of a fleet snapshot as dictionaries and models",
+    )
+    args = parser.parse_args(argv)
+    if args.imports is not None:
+        results = run_imports(args.imports or list(IMPORT_MODULES), args.import_runs)
+        for result in results:
+            _print(result)
+        slow = [
+            result["module"]
+            for result in results
+            if args.max_import_ms is not None
+            and result["import ms"] > args.max_import_ms
+        ]
+        if slow:
+            parser.exit(
+                1, f"Import slower than {args.max_import_ms} ms: {', '.join(slow)}\n"
+            )
+        return results
+    if args.models is not None:
+        results = run_models(args.models, args.values)
+        for result in results:
+            _print(result)
+        return results
+    if args.decode is not None:
+        if args.decode:
+            payloads = {}
+            for file_name in args.decode:
+                with open(file_name, "rb") as f:
+                    payloads[os.path.basename(file_name)] = f.read()
+        else:
+            server = MockServer(
+                values=args.values,
+                history_page_size=args.history_page_size,
+            )
+            payloads = {
+                "values": json.dumps(server.values_payload()).encode(),
+                "history": json.dumps(server.history_payload()).encode(),
+            }
+        results = run_decode(payloads, args.repeat)
+        for result in results:
+            _print(result)
+        return results
+    options = {
+        "units": args.units,
+        "values": args.values,
+        "history_pages": args.history_pages,
+        "history_page_size": args.history_page_size,
+        "file_size": args.file_size,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+    }
+    connection, child_connection = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=_serve, args=(child_connection, options), daemon=True
+    )
+    server.start()
+    url = connection.recv()
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            for client in args.clients:
+                for scenario in args.scenarios:
+                    # a fresh process, so the peak RSS is not the maximum of all scenarios
+                    with ProcessPoolExecutor(1, mp_context=spawn) as process:
+                        result = process.submit(
+                            _run_scenario,
+                            client,
+                            scenario,
+                            url,
+                            args.calls,
+                            options,
+                            path,
+                            args.concurrency,
+                            args.executor,
+                            args.workers,
+                            not args.no_pool,
+                        ).result()
+                    results.append(result)
+                    _print(result)
+    finally:
+        connection.send(None)
+        server.join(timeout=5)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""comap.cache module
+
+Helpers to cache metadata (list of units, catalog of values) used by both
+`comap.api` and `comap.api_async`.
+
+- TTLCache      - dictionary with entries expiring after a time-to-live,
+                  limited to a maximum number of entries (least recently used are evicted)
+- NameIndex     - lookup of GUIDs by name
+- ResponseCache - API responses validated by ETag / Last-Modified,
+                  in memory and optionally on the disk
+
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from .constants import (
+    CACHE_SIZE,
+    CACHE_TTL,
+    RESPONSE_CACHE_APIS,
+    RESPONSE_CACHE_DISK_SIZE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Cache with time-to-live and LRU eviction"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_size: int = CACHE_SIZE) -> None:
+        """Create the cache
+
+        Parameters:
+        -----------
+        ttl: `float`, optional
+            time (in seconds) after which the entries expire
+        max_size: `int`, optional
+            maximum number of entries
+        """
+        self._ttl = ttl
+        self._max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value or `None` if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value) -> None:
+        """Store the value, evicting the least recently used entries if full"""
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class NameIndex:
+    """Lookup of GUIDs by name"""
+
+    def __init__(self, items: list, guid_key: str) -> None:
+        """Build the index
+
+        Parameters:
+        -----------
+        items: `list` of `dict`
+            API response items with the 'name' and `guid_key` keys
+        guid_key: `str`
+            e.g. 'unitGuid' or 'valueGuid'
+        """
+        self._names = [(item["name"], item[guid_key]) for item in items]
+        self._exact = {}
+        for name, guid in self._names:
+            self._exact.setdefault(name, guid)
+        self._found = {}
+
+    def find(self, name: str, exact: bool = False) -> str | None:
+        """Find GUID by name
+
+        Parameters:
+        -----------
+        name: `str`
+            the name (or its part)
+        exact: `bool`, optional
+            match the whole name, otherwise return the first item containing `name`
+
+        Returns:
+        --------
+        GUID (`str`) or `None`
+        """
+        if exact:
+            return self._exact.get(name)
+        if name not in self._found:
+            self._found[name] = next(
+                (guid for item_name, guid in self._names if item_name.find(name) >= 0),
+                None,
+            )
+        return self._found[name]
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """Body of a cached response with its validators"""
+
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    stored: float
+
+    def validators(self) -> dict:
+        """Headers of the conditional request"""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Cache of API responses validated by ETag / Last-Modified
+
+    The responses are kept in memory and optionally in a directory on the disk,
+    both limited to a maximum number of entries (least recently used are evicted).
+    Can be shared by multiple `WSV` instances (also from multiple threads).
+    """
+
+    def __init__(
+        self,
+        max_size: int = CACHE_SIZE,
+        path: str | None = None,
+        max_disk_size: int = RESPONSE_CACHE_DISK_SIZE,
+        max_age: float = 0,
+        apis: tuple = RESPONSE_CACHE_APIS,
+    ) -> None:
+        """Create the cache
+
+        Parameters:
+        -----------
+        max_size: `int`, optional
+            maximum number of responses kept in memory
+        path: `str`, optional
+            directory of the on-disk tier (memory only if not specified)
+        max_disk_size: `int`, optional
+            maximum number of responses kept on the disk
+        max_age: `float`, optional
+            time (in seconds) to serve a response without validators
+            without asking the API (not cached if 0)
+        apis: `tuple` of `str`, optional
+            names of the cached APIs (keys of `WSV_URL`)
+        """
+        self.apis = apis
+        self._max_size = max_size
+        self._path = path
+        self._max_disk_size = max_disk_size
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._stats = Counter()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            files = [
+                entry
+                for entry in os.scandir(path)
+                if entry.is_file() and entry.name.endswith(".cache")
+            ]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self._disk[entry.name[: -len(".cache")]] = None
+
+    @property
+    def on_disk(self) -> bool:
+        """`True` if the responses are also stored on the disk (`path`)"""
+        return self._path is not None
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Key of the response (for example URL template, login ID, unit and payload)"""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def lookup(self, key: str) -> tuple[bytes | None, dict]:
+        """Find the response
+
+        Returns:
+        --------
+        `tuple` - the body if it can be used without asking the API,
+        otherwise `None` and the headers of the conditional request
+        """
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                return None, {}
+            if (
+                entry.etag is None
+                and entry.last_modified is None
+                and time.time() - entry.stored < self._max_age
+            ):
+                self._stats["hits"] += 1
+                self._stats["fresh"] += 1
+                return entry.body, {}
+            return None, entry.validators()
+
+    def not_modified(self, key: str) -> bytes | None:
+        """Return the cached body after the API responded 304 (not modified)"""
+        with self._lock:
+            entry = self._get(key)
+            if entry is None:
+                return None
+            entry.stored = time.time()
+            self._stats["hits"] += 1
+            self._stats["not_modified"] += 1
+            return entry.body
+
+    def store(
+        self, key: str, body: bytes, etag: str | None, last_modified: str | None
+    ) -> None:
+        """Store the response received from the API"""
+        with self._lock:
+            self._stats["misses"] += 1
+            if etag is None and last_modified is None and not self._max_age:
+                return
+            entry = CachedResponse(body, etag, last_modified, time.time())
+            self._set_memory(key, entry)
+            if self._path is not None:
+                self._write(key, entry)
+
+    def stats(self) -> dict:
+        """Return the counters
+
+        Returns:
+        --------
+        {
+            'hits': `int`, # responses served from the cache
+            'misses': `int`, # responses downloaded from the API
+            'not_modified': `int`, # hits confirmed by the API (304)
+            'fresh': `int`, # hits served without asking the API (`max_age`)
+            'entries': `int`, # responses in memory
+            'disk_entries': `int` # responses on the disk
+        }
+        """
+        with self._lock:
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "not_modified": self._stats["not_modified"],
+                "fresh": self._stats["fresh"],
+                "entries": len(self._memory),
+                "disk_entries": len(self._disk),
+            }
+
+    def clear(self) -> None:
+        """Remove all responses (also from the disk) and reset the counters"""
+        with self._lock:
+            for key in self._disk:
+                self._remove(key)
+            self._memory.clear()
+            self._disk.clear()
+            self._stats.clear()
+
+    def _get(self, key: str) -> CachedResponse | None:
+        """The entry from memory, or from the disk (moved to memory)"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        if key not in self._disk:
+            return None
+        entry = self._read(key)
+        if entry is None:
+            del self._disk[key]
+            return None
+        self._disk.move_to_end(key)
+        self._set_memory(key, entry)
+        return entry
+
+    def _set_memory(self, key: str, entry: CachedResponse) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_size:
+            self._memory.popitem(last=False)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, key + ".cache")
+
+    def _read(self, key: str) -> CachedResponse | None:
+        """Read the entry from the disk (header line and body)"""
+        try:
+            with open(self._file(key), "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+            os.utime(self._file(key))
+        except Exception as e:
+            _LOGGER.error("Error reading cached response %s: %s", key, e)
+            return None
+        return CachedResponse(
+            body, header["etag"], header["last_modified"], header["stored"]
+        )
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        """Write the entry to the disk, evict the least recently used"""
+        header = {
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "stored": entry.stored,
+        }
+        try:
+            with open(self._file(key) + ".tmp", "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                f.write(entry.body)
+            os.replace(self._file(key) + ".tmp", self._file(key))
+        except Exception as e:
+            _LOGGER.error("Error writing cached response %s: %s", key, e)
+            return
+        self._disk[key] = None
+        self._disk.move_to_end(key)
+        while len(self._disk) > self._max_disk_size:
+            self._remove(self._disk.popitem(last=False)[0])
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
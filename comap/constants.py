@@ -5,6 +5,33 @@ Text constants for ComAp API
 COMAP_KEY = "Comap-Key"
 AUTHORIZATION = "Authorization"
 TIMEOUT = 30
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+CONCURRENCY = 10
+CHUNK_SIZE = 65536
+FILES_MANIFEST = ".manifest.json"
+CACHE_TTL = 300
+CACHE_SIZE = 1000
+TOKEN_REFRESH_MARGIN = 300
+TOKEN_REFRESH_BACKOFF = 5
+RATE_LIMIT = 10
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POLL_INTERVAL = 60
+POLL_JITTER = 0.1
+SUBSCRIPTION_QUEUE_SIZE = 10
+SUBSCRIPTION_OVERFLOW = ("drop_oldest", "drop_newest", "block")
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRICS_SPANS = 1000
+FLEET_SIGNALS = ("actual_power", "nominal_power", "engine_state", "fuel_level", "run_hours")
+HISTORY_WINDOW = 30
+DATE_FORMAT = "%m/%d/%Y"
+OFFLOAD_SIZE = 65536
+HISTORY_ENTRY_SIZE = 80
+RESPONSE_CACHE_APIS = ("units", "info", "files", "comments")
+RESPONSE_CACHE_DISK_SIZE = 10000
 
 IDENTITY_URL = {
     'authenticate': 'https://api.websupervisor.net/identity/application/authenticate'    
@@ -0,0 +1,107 @@
+"""comap.decode module
+
+Decoding of the API responses, used by both `comap.api` and `comap.api_async`.
+
+The fastest available JSON decoder is used - `orjson` or `msgspec` if installed
+(`pip install comap[fast]`), the standard `json` module otherwise.
+
+- loads           - decode a JSON document (`bytes` or `str`)
+- parse_dates     - convert the timestamp fields of the API results to datetime
+- parse_timestamp - convert one timestamp to datetime
+- decode_response - decode an API response and convert the timestamps of its items
+- decode_history  - decode a history page and convert the timestamps of its entries
+- sort_history    - convert the timestamps of a merged history and sort its entries
+
+The `decode_*` functions can run in a thread or process pool (`executor` of the async `WSV`).
+
+"""
+import json
+from datetime import datetime
+from operator import itemgetter
+from typing import Any
+
+try:
+    import orjson
+
+    loads = orjson.loads
+    BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        loads = msgspec.json.decode
+        BACKEND = "msgspec"
+    except ImportError:
+        loads = json.loads
+        BACKEND = "json"
+
+
+def parse_dates(items: list, *keys: str) -> list:
+    """Convert the timestamp fields of the items to datetime (in place)
+
+    Parameters:
+    -----------
+    items: `list` of `dict`
+        API results, for example the 'history' of a value
+    keys: `str`
+        names of the timestamp fields, for example 'validFrom', 'validTo'
+
+    Returns:
+    --------
+    the same `list`
+    """
+    fromisoformat = datetime.fromisoformat
+    for item in items:
+        for key in keys:
+            item[key] = fromisoformat(item[key])
+    return items
+
+
+def parse_timestamp(timestamp: datetime | str) -> datetime:
+    """Convert the timestamp to datetime (if it was not converted yet)"""
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp)
+    return timestamp
+
+
+def decode_response(document: bytes | str, items: str | None = None, *keys: str) -> Any:
+    """Decode the API response and convert the timestamp fields of its items
+
+    Parameters:
+    -----------
+    document: `bytes` or `str`
+        the response body
+    items: `str`, optional
+        the key of the `list` of items in the response, for example 'values'
+    keys: `str`
+        names of the timestamp fields of the items, for example 'timeStamp'
+
+    Returns:
+    --------
+    the decoded response
+    """
+    response = loads(document)
+    if keys:
+        parse_dates(response[items], *keys)
+    return response
+
+
+def decode_history(document: bytes | str, *keys: str) -> dict:
+    """Decode a page of the history API response and convert the timestamp fields
+    ('validFrom', 'validTo') of the history entries"""
+    response = loads(document)
+    if keys:
+        for value in response["values"]:
+            parse_dates(value["history"], *keys)
+    return response
+
+
+def sort_history(values: list, *keys: str) -> list:
+    """Convert the timestamp fields ('validFrom', 'validTo') of the merged history
+    entries and sort the entries of each value by 'validFrom' (in place)"""
+    by_valid_from = itemgetter("validFrom")
+    for value in values:
+        if keys:
+            parse_dates(value["history"], *keys)
+        value["history"].sort(key=by_valid_from)
+    return values
@@ -0,0 +1,301 @@
+"""comap.metrics module
+
+Request instrumentation, used by both `comap.api` and `comap.api_async`.
+
+- Metrics          - hooks called at the start and the end of each API request
+- MetricsCollector - aggregates the requests in memory, exports Prometheus text format
+- SpanRecorder     - records the requests as OpenTelemetry-style spans
+- MetricsGroup     - passes the requests to multiple hooks
+
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from .constants import METRICS_BUCKETS, METRICS_SPANS
+
+
+class Metrics:
+    """Base class of the request hooks
+
+    Pass an instance to `Identity` or `WSV` (`metrics` parameter) and override the methods.
+    The hooks are called for each API call, including all its retries.
+    """
+
+    def on_request_start(self, method: str, api: str, unit_guid: str | None) -> Any:
+        """Called before the request is sent
+
+        Parameters:
+        -----------
+        method: `str`
+            'GET' or 'POST'
+        api: `str`
+            name of the API (key of `WSV_URL` or `IDENTITY_URL`)
+        unit_guid: `str` or `None`
+            the genset ID, for the unit APIs
+
+        Returns:
+        --------
+        any context, passed to `on_request_end`
+        """
+        return None
+
+    def on_request_end(
+        self,
+        context: Any,
+        method: str,
+        api: str,
+        unit_guid: str | None,
+        status: int | None,
+        size: int | None,
+        duration: float,
+        retries: int,
+    ) -> None:
+        """Called when the request is finished (or failed)
+
+        Parameters:
+        -----------
+        context: any
+            the value returned by `on_request_start`
+        method: `str`
+            'GET' or 'POST'
+        api: `str`
+            name of the API (key of `WSV_URL` or `IDENTITY_URL`)
+        unit_guid: `str` or `None`
+            the genset ID, for the unit APIs
+        status: `int` or `None`
+            HTTP status of the last attempt, `None` if there was no response
+        size: `int` or `None`
+            number of bytes of the response body read by the client (`None` if
+            there was no response). Streamed downloads are reported when the body
+            is read, with the bytes actually received
+        duration: `float`
+            time from the start of the first attempt (in seconds)
+        retries: `int`
+            number of repeated attempts
+        """
+
+
+class MetricsCollector(Metrics):
+    """Count the requests, bytes, retries and duration by method, API and status"""
+
+    def __init__(self, buckets: tuple = METRICS_BUCKETS) -> None:
+        """Setup of the collector
+
+        Parameters:
+        -----------
+        buckets: `tuple` of `float`, optional
+            upper bounds of the duration histogram buckets (in seconds)
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def on_request_end(
+        self,
+        context: Any,
+        method: str,
+        api: str,
+        unit_guid: str | None,
+        status: int | None,
+        size: int | None,
+        duration: float,
+        retries: int,
+    ) -> None:
+        """Add the request to the statistics"""
+        key = (method, api, "none" if status is None else str(status))
+        bucket = bisect.bisect_left(self._buckets, duration)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0,
+                    "duration": 0.0,
+                    "bytes": 0,
+                    "retries": 0,
+                    "buckets": [0] * (len(self._buckets) + 1),
+                }
+            series["count"] += 1
+            series["duration"] += duration
+            series["bytes"] += size or 0
+            series["retries"] += retries
+            series["buckets"][bucket] += 1
+
+    def summary(self) -> list:
+        """Return the statistics
+
+        Returns:
+        --------
+        `list` of `dict`
+        [{
+            'method': `str`,
+            'api': `str`,
+            'status': `str`,
+            'count': `int`,
+            'duration': `float`, # total duration in seconds
+            'bytes': `int`,
+            'bytes/s': `float`, # bytes / duration, the download speed for 'download'
+            'retries': `int`,
+            'buckets': `dict` # number of requests by the bucket upper bound
+        }]
+        """
+        with self._lock:
+            return [
+                {
+                    "method": method,
+                    "api": api,
+                    "status": status,
+                    "count": series["count"],
+                    "duration": series["duration"],
+                    "bytes": series["bytes"],
+                    "bytes/s": (
+                        series["bytes"] / series["duration"]
+                        if series["duration"]
+                        else 0.0
+                    ),
+                    "retries": series["retries"],
+                    "buckets": dict(
+                        zip(self._buckets + (float("inf"),), series["buckets"])
+                    ),
+                }
+                for (method, api, status), series in sorted(self._series.items())
+            ]
+
+    def reset(self) -> None:
+        """Forget the statistics"""
+        with self._lock:
+            self._series = {}
+
+    def prometheus(self) -> str:
+        """Export the statistics in Prometheus text format"""
+        requests = [
+            "# HELP comap_requests_total Number of ComAp API requests.",
+            "# TYPE comap_requests_total counter",
+        ]
+        durations = [
+            "# HELP comap_request_duration_seconds Duration of ComAp API requests.",
+            "# TYPE comap_request_duration_seconds histogram",
+        ]
+        sizes = [
+            "# HELP comap_response_bytes_total Size of ComAp API responses.",
+            "# TYPE comap_response_bytes_total counter",
+        ]
+        retries = [
+            "# HELP comap_request_retries_total Number of repeated ComAp API requests.",
+            "# TYPE comap_request_retries_total counter",
+        ]
+        for series in self.summary():
+            labels = (
+                f'method="{series["method"]}",api="{series["api"]}",'
+                f'status="{series["status"]}"'
+            )
+            requests.append(f"comap_requests_total{{{labels}}} {series['count']}")
+            cumulative = 0
+            for bound, count in series["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                durations.append(
+                    f'comap_request_duration_seconds_bucket{{{labels},le="{le}"}} '
+                    f"{cumulative}"
+                )
+            durations.append(
+                f"comap_request_duration_seconds_sum{{{labels}}} {series['duration']}"
+            )
+            durations.append(
+                f"comap_request_duration_seconds_count{{{labels}}} {series['count']}"
+            )
+            sizes.append(f"comap_response_bytes_total{{{labels}}} {series['bytes']}")
+            retries.append(
+                f"comap_request_retries_total{{{labels}}} {series['retries']}"
+            )
+        return "\n".join(requests + durations + sizes + retries) + "\n"
+
+
+class SpanRecorder(Metrics):
+    """Record the requests as spans with OpenTelemetry attribute names"""
+
+    def __init__(
+        self,
+        exporter: Callable[[dict], Any] | None = None,
+        max_spans: int = METRICS_SPANS,
+    ) -> None:
+        """Setup of the recorder
+
+        Parameters:
+        -----------
+        exporter: `Callable`, optional
+            called with each finished span (`dict`), for example to forward it
+            to a tracing backend. If not specified, the spans are kept in `spans`.
+        max_spans: `int`, optional
+            maximum number of spans kept in `spans` (the oldest are dropped)
+        """
+        self._exporter = exporter
+        self.spans = deque(maxlen=max_spans)
+
+    def on_request_start(self, method: str, api: str, unit_guid: str | None) -> int:
+        """Return the start time of the span"""
+        return time.time_ns()
+
+    def on_request_end(
+        self,
+        context: int,
+        method: str,
+        api: str,
+        unit_guid: str | None,
+        status: int | None,
+        size: int | None,
+        duration: float,
+        retries: int,
+    ) -> None:
+        """Create the span and pass it to the exporter"""
+        span = {
+            "name": f"{method} {api}",
+            "kind": "CLIENT",
+            "trace_id": os.urandom(16).hex(),
+            "span_id": os.urandom(8).hex(),
+            "start_time_unix_nano": context,
+            "end_time_unix_nano": time.time_ns(),
+            "status": "OK" if status in (200, 206, 304) else "ERROR",
+            "attributes": {
+                "http.request.method": method,
+                "http.response.status_code": status,
+                "http.response.body.size": size,
+                "comap.api": api,
+                "comap.unit_guid": unit_guid,
+                "comap.retries": retries,
+            },
+        }
+        if self._exporter is None:
+            self.spans.append(span)
+        else:
+            self._exporter(span)
+
+
+class MetricsGroup(Metrics):
+    """Pass the requests to multiple hooks"""
+
+    def __init__(self, *hooks: Metrics) -> None:
+        self._hooks = hooks
+
+    def on_request_start(self, method: str, api: str, unit_guid: str | None) -> list:
+        return [hook.on_request_start(method, api, unit_guid) for hook in self._hooks]
+
+    def on_request_end(
+        self,
+        context: list,
+        method: str,
+        api: str,
+        unit_guid: str | None,
+        status: int | None,
+        size: int | None,
+        duration: float,
+        retries: int,
+    ) -> None:
+        for hook, hook_context in zip(self._hooks, context):
+            hook.on_request_end(
+                hook_context, method, api, unit_guid, status, size, duration, retries
+            )
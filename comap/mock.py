@@ -0,0 +1,405 @@
+"""comap.mock module
+
+Local stand-in for the ComAp Cloud API, to test and benchmark the clients without network access.
+
+- MockServer - aiohttp server implementing the routes of `WSV_URL` and `IDENTITY_URL`
+
+The API classes call the URLs from `comap.constants`, `patch_urls` points them to the
+mock server (`MockServer.start` does it by default).
+
+"""
+import asyncio
+import hashlib
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from .constants import (
+    CHUNK_SIZE,
+    IDENTITY_URL,
+    RESPONSE_CACHE_APIS,
+    VALUE_GUID,
+    WSV_URL,
+)
+
+API_HOST = "https://api.websupervisor.net"
+
+
+def patch_urls(url: str) -> dict:
+    """Point `WSV_URL` and `IDENTITY_URL` to the server at `url`
+
+    Returns:
+    --------
+    `dict` - the original URLs, to be passed to `restore_urls`
+    """
+    original = {"WSV_URL": dict(WSV_URL), "IDENTITY_URL": dict(IDENTITY_URL)}
+    for urls in (WSV_URL, IDENTITY_URL):
+        for api, api_url in urls.items():
+            urls[api] = api_url.replace(API_HOST, url)
+    return original
+
+
+def restore_urls(original: dict) -> None:
+    """Restore the URLs replaced by `patch_urls`"""
+    WSV_URL.update(original["WSV_URL"])
+    IDENTITY_URL.update(original["IDENTITY_URL"])
+
+
+class MockServer:
+    """Local server answering the ComAp Cloud API calls with generated data"""
+
+    def __init__(
+        self,
+        units: int = 10,
+        values: int = 20,
+        history_pages: int = 3,
+        history_page_size: int = 100,
+        files: int = 3,
+        file_size: int = 1_000_000,
+        latency: float = 0,
+        error_rate: float = 0,
+        throttle_rate: float = 0,
+        retry_after: float = 1,
+        etags: bool = True,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Setup of the mock server
+
+        Parameters:
+        -----------
+        units: `int`, optional
+            number of units
+        values: `int`, optional
+            number of values of each unit
+        history_pages: `int`, optional
+            number of pages of the history API response (linked by 'nextOffset')
+        history_page_size: `int`, optional
+            number of history entries of each value on one page
+        files: `int`, optional
+            number of files of each unit
+        file_size: `int`, optional
+            size of each file (in bytes)
+        latency: `float`, optional
+            response delay (in seconds)
+        error_rate: `float`, optional
+            share of the requests failing with HTTP 500 (0-1)
+        throttle_rate: `float`, optional
+            share of the requests rejected with HTTP 429 (0-1)
+        retry_after: `float`, optional
+            'Retry-After' header of the HTTP 429 responses (in seconds)
+        etags: `bool`, optional
+            send 'ETag' with the metadata responses (units, info, files, comments)
+            and answer the matching 'If-None-Match' with 304 (not modified)
+        host: `str`, optional
+            listening address
+        port: `int`, optional
+            listening port (0 = any free port)
+        """
+        self.units = units
+        self.values = values
+        self.history_pages = history_pages
+        self.history_page_size = history_page_size
+        self.files = files
+        self.file_size = file_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.etags = etags
+        self.requests = Counter()
+        self.not_modified = Counter()
+        self.history_queries = []
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self._host = host
+        self._port = port
+        self._runner = None
+        self._url = None
+        self._original_urls = None
+        self._random = random.Random(0)
+        names = list(VALUE_GUID)
+        self._values = [
+            (
+                (names[i], VALUE_GUID[names[i]])
+                if i < len(names)
+                else (f"value_{i}", f"00000000-0000-0000-0000-{i:012d}")
+            )
+            for i in range(values)
+        ]
+        self._file = bytes(range(256)) * (file_size // 256 + 1)
+
+    @property
+    def url(self) -> str | None:
+        """Base URL of the running server"""
+        return self._url
+
+    async def start(self, patch: bool = True) -> str:
+        """Start the server
+
+        Parameters:
+        -----------
+        patch: `bool`, optional
+            point `WSV_URL` and `IDENTITY_URL` to this server (until `stop`),
+            so the API classes call it instead of ComAp Cloud
+
+        Returns:
+        --------
+        `str` - base URL of the server
+        """
+        self._runner = web.AppRunner(self._application(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self._url = f"http://{self._host}:{port}"
+        if patch:
+            self._original_urls = patch_urls(self._url)
+        return self._url
+
+    async def stop(self) -> None:
+        """Stop the server and restore the API URLs"""
+        if self._original_urls is not None:
+            restore_urls(self._original_urls)
+            self._original_urls = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self._url = None
+
+    async def __aenter__(self) -> "MockServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.stop()
+
+    def _application(self) -> web.Application:
+        """Create the routes from the URLs of the API constants"""
+        handlers = {
+            "authenticate": self._authenticate,
+            "units": self._units,
+            "values": self._values_handler,
+            "info": self._info,
+            "history": self._history,
+            "files": self._files,
+            "command": self._command,
+            "comments": self._comments,
+            "download": self._download,
+        }
+        methods = {"authenticate": "POST", "command": "POST"}
+        application = web.Application()
+        for urls in (IDENTITY_URL, WSV_URL):
+            for api, url in urls.items():
+                application.router.add_route(
+                    methods.get(api, "GET"),
+                    urlsplit(url).path,
+                    self._wrap(api, handlers[api]),
+                )
+        return application
+
+    def _wrap(self, api: str, handler):
+        """Add the latency, errors and request counting to the handler"""
+
+        async def wrapper(request: web.Request) -> web.StreamResponse:
+            self.requests[api] += 1
+            self.in_flight[api] += 1
+            self.max_in_flight[api] = max(self.max_in_flight[api], self.in_flight[api])
+            try:
+                return await self._respond(api, handler, request)
+            finally:
+                self.in_flight[api] -= 1
+
+        return wrapper
+
+    async def _respond(
+        self, api: str, handler, request: web.Request
+    ) -> web.StreamResponse:
+        """Answer one request with the latency and errors"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._random.random() < self.throttle_rate:
+            return web.Response(
+                status=429,
+                text="Too many requests",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        if self._random.random() < self.error_rate:
+            return web.Response(status=500, text="Internal server error")
+        response = await handler(request)
+        if not self.etags or api not in RESPONSE_CACHE_APIS:
+            return response
+        etag = '"' + hashlib.sha1(response.body).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified[api] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return response
+
+    def unit_guid(self, i: int) -> str:
+        """Generated unitGuid of the i-th unit"""
+        return f"genset{i:032x}"
+
+    def _selected(self, value_guids: str | None) -> list:
+        """Values (name, valueGuid) selected by the value guids separated by comma"""
+        if value_guids is None:
+            return self._values
+        # the GUIDs are not case sensitive
+        selected = {guid.lower() for guid in value_guids.split(",")}
+        return [value for value in self._values if value[1].lower() in selected]
+
+    def values_payload(self, value_guids: str | None = None) -> dict:
+        """Generate the response of the values API"""
+        now = datetime.now().replace(microsecond=0).isoformat()
+        return {
+            "values": [
+                {
+                    "name": name,
+                    "valueGuid": value_guid,
+                    "value": f"{self._random.uniform(0, 1000):.1f}",
+                    "unit": "",
+                    "highLimit": 1000,
+                    "lowLimit": 0,
+                    "decimalPlaces": 1,
+                    "timeStamp": now,
+                }
+                for name, value_guid in self._selected(value_guids)
+            ]
+        }
+
+    def history_payload(self, offset: int = 0, value_guids: str | None = None) -> dict:
+        """Generate one page of the response of the history API"""
+        start = datetime(2023, 1, 1) + timedelta(
+            minutes=offset * self.history_page_size
+        )
+        history = [
+            {
+                "value": str(i),
+                "validFrom": (start + timedelta(minutes=i)).isoformat(),
+                "validTo": (start + timedelta(minutes=i + 1)).isoformat(),
+            }
+            for i in range(self.history_page_size)
+        ]
+        return {
+            "values": [
+                {"valueGuid": value_guid, "history": history}
+                for _, value_guid in self._selected(value_guids)
+            ],
+            "nextOffset": offset + 1 if offset + 1 < self.history_pages else None,
+        }
+
+    async def _authenticate(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "token_type": "Bearer",
+                "expires_in": 3599,
+                "ext_expires_in": 3599,
+                "access_token": f"mock-token-{self.requests['authenticate']}",
+            }
+        )
+
+    async def _units(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "units": [
+                    {
+                        "name": f"unit {i}",
+                        "unitGuid": self.unit_guid(i),
+                        "url": f"{self._url}/units/{self.unit_guid(i)}",
+                    }
+                    for i in range(self.units)
+                ]
+            }
+        )
+
+    async def _values_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.values_payload(request.query.get("valueGuids")))
+
+    async def _info(self, request: web.Request) -> web.Response:
+        unit_guid = request.match_info["unit_guid"]
+        return web.json_response(
+            {
+                "name": f"unit {unit_guid}",
+                "unitGuid": unit_guid,
+                "ownerLoginId": request.match_info["login_id"],
+                "applicationType": "Genset",
+                "timezone": "UTC",
+                "connection": {
+                    "enabled": True,
+                    "airGateId": "mock",
+                    "ipAddress": "127.0.0.1",
+                    "port": 23,
+                    "controllerAddress": 1,
+                },
+                "position": {
+                    "positionType": "Static",
+                    "latitude": 50.0,
+                    "longitude": 14.4,
+                },
+            }
+        )
+
+    async def _history(self, request: web.Request) -> web.Response:
+        self.history_queries.append(dict(request.query))
+        return web.json_response(
+            self.history_payload(
+                int(request.query.get("offset", 0)), request.query.get("valueGuids")
+            )
+        )
+
+    async def _files(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "files": [
+                    {
+                        "fileName": f"file_{i}.ail",
+                        "fileType": "Archive",
+                        "generated": datetime(2023, 1, 1, i).isoformat(),
+                    }
+                    for i in range(self.files)
+                ]
+            }
+        )
+
+    async def _command(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"command": body.get("command"), "status": "Done"})
+
+    async def _comments(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "comments": [
+                    {
+                        "id": 1,
+                        "author": "mock",
+                        "date": datetime(2023, 1, 1).isoformat(),
+                        "text": "Mock comment",
+                        "active": True,
+                    }
+                ]
+            }
+        )
+
+    async def _download(self, request: web.Request) -> web.StreamResponse:
+        start = 0
+        if request.http_range.start is not None:
+            start = request.http_range.start
+        if start >= self.file_size:
+            return web.Response(
+                status=416, headers={"Content-Range": f"bytes */{self.file_size}"}
+            )
+        body = memoryview(self._file)[start : self.file_size]
+        # chunked, without 'Content-Length' (as the files streamed by the API)
+        response = web.StreamResponse(
+            status=206 if start else 200,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for offset in range(0, len(body), CHUNK_SIZE):
+            await response.write(body[offset : offset + CHUNK_SIZE])
+        await response.write_eof()
+        return response
@@ -0,0 +1,243 @@
+"""comap.models module
+
+Typed results of the WSV API, returned with `as_models=True` instead of the dictionaries.
+With `msgspec` installed (`pip install comap[models]`) the classes are `msgspec.Struct`
+types and the API responses are decoded straight into them, without the intermediate
+dictionaries. Otherwise they are dataclasses with `__slots__`, created from the decoded
+responses. Both need less memory than dictionaries with the same fields.
+
+- Unit          - unit (from `units`)
+- Value         - value (from `values`)
+- HistoryEntry  - one entry of the value history
+- ValueHistory  - history of one value on one page (from `history`)
+- Comment       - comment (from `comments`)
+- FileInfo      - file stored on the controller (from `files`)
+- decode_models - decode an API response with its items as models
+
+The timestamps are `datetime`, or ISO 8601 `str` if the `WSV` was created with `parse_dates=False`.
+
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from .decode import loads, parse_dates
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if msgspec is not None:
+    BACKEND = "msgspec"
+
+    class _Model(msgspec.Struct, rename="camel", gc=False):
+        """Base of the models, the fields are named as in the API (camelCase)"""
+
+    def _model(cls: type) -> type:
+        return cls
+
+else:
+    BACKEND = "dataclass"
+
+    class _Model:
+        """Base of the models"""
+
+        __slots__ = ()
+
+    def _model(cls: type) -> type:
+        return dataclass(slots=True)(cls)
+
+
+@_model
+class Unit(_Model):
+    """Unit (from `WSV.units`)"""
+
+    name: str
+    unit_guid: str
+    url: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Unit":
+        """Create the model from the API response"""
+        return cls(data["name"], data["unitGuid"], data["url"])
+
+
+@_model
+class Value(_Model):
+    """Value (from `WSV.values`)"""
+
+    name: str
+    value_guid: str
+    value: str
+    unit: str
+    high_limit: float
+    low_limit: float
+    decimal_places: int
+    time_stamp: datetime
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Value":
+        """Create the model from the API response"""
+        return cls(
+            data["name"],
+            data["valueGuid"],
+            data["value"],
+            data["unit"],
+            data["highLimit"],
+            data["lowLimit"],
+            data["decimalPlaces"],
+            data["timeStamp"],
+        )
+
+
+@_model
+class HistoryEntry(_Model):
+    """One entry of the value history"""
+
+    value: str
+    valid_from: datetime
+    valid_to: datetime
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HistoryEntry":
+        """Create the model from the API response"""
+        return cls(data["value"], data["validFrom"], data["validTo"])
+
+
+@_model
+class ValueHistory(_Model):
+    """History of one value on one page (from `WSV.history`)"""
+
+    value_guid: str
+    history: list[HistoryEntry]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ValueHistory":
+        """Create the model from the API response"""
+        return cls(
+            data["valueGuid"],
+            [HistoryEntry.from_dict(entry) for entry in data["history"]],
+        )
+
+
+@_model
+class Comment(_Model):
+    """Comment (from `WSV.comments`)"""
+
+    id: int
+    author: str
+    date: datetime
+    text: str
+    active: bool
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Comment":
+        """Create the model from the API response"""
+        return cls(
+            data["id"], data["author"], data["date"], data["text"], data["active"]
+        )
+
+
+@_model
+class FileInfo(_Model):
+    """File stored on the controller (from `WSV.files`)"""
+
+    file_name: str
+    file_type: str
+    generated: datetime
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FileInfo":
+        """Create the model from the API response"""
+        return cls(data["fileName"], data["fileType"], data["generated"])
+
+
+# timestamp fields of the models, converted by the dataclass path
+_DATE_KEYS = {
+    Value: ("timeStamp",),
+    HistoryEntry: ("validFrom", "validTo"),
+    Comment: ("date",),
+    FileInfo: ("generated",),
+}
+
+if msgspec is not None:
+    # variants keeping the timestamps as `str` (`parse_dates=False`),
+    # defined on the module level so the process pool can pickle them
+
+    class _ValueText(Value):
+        time_stamp: str
+
+    class _HistoryEntryText(HistoryEntry):
+        valid_from: str
+        valid_to: str
+
+    class _ValueHistoryText(ValueHistory):
+        history: list[_HistoryEntryText]
+
+    class _CommentText(Comment):
+        date: str
+
+    class _FileInfoText(FileInfo):
+        generated: str
+
+    _TEXT_MODELS = {
+        Value: _ValueText,
+        HistoryEntry: _HistoryEntryText,
+        ValueHistory: _ValueHistoryText,
+        Comment: _CommentText,
+        FileInfo: _FileInfoText,
+    }
+    _decoders = {}
+
+
+def _decoder(items: str, model: type, dates: bool) -> "msgspec.json.Decoder":
+    """Decoder of the API responses with the `items` list of `model`"""
+    key = (items, model, dates)
+    decoder = _decoders.get(key)
+    if decoder is None:
+        if not dates:
+            model = _TEXT_MODELS.get(model, model)
+        response = msgspec.defstruct(
+            "Response",
+            [(items, list[model]), ("next_offset", int | None, None)],
+            rename="camel",
+        )
+        decoder = _decoders[key] = msgspec.json.Decoder(response)
+    return decoder
+
+
+def decode_models(
+    document: bytes | str, items: str, model: type, dates: bool = True
+) -> dict:
+    """Decode the API response with its items as models
+
+    With `msgspec`, the document is decoded straight into the models and only the
+    items and 'nextOffset' (of the history pages) are kept from the response.
+    Can run in a thread or process pool, as the `comap.decode` functions.
+
+    Parameters:
+    -----------
+    document: `bytes` or `str`
+        the response body
+    items: `str`
+        the key of the `list` of items in the response, for example 'values'
+    model: `type`
+        the model of the items, for example `Value`
+    dates: `bool`, optional
+        convert the timestamps to datetime
+
+    Returns:
+    --------
+    `dict` - the response with the `list` of models in `items`
+    """
+    if msgspec is not None:
+        response = _decoder(items, model, dates).decode(document)
+        return {items: getattr(response, items), "nextOffset": response.next_offset}
+    response = loads(document)
+    if dates and model is ValueHistory:
+        for value in response[items]:
+            parse_dates(value["history"], *_DATE_KEYS[HistoryEntry])
+    elif dates:
+        parse_dates(response[items], *_DATE_KEYS.get(model, ()))
+    response[items] = [model.from_dict(item) for item in response[items]]
+    return response
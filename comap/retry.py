@@ -0,0 +1,117 @@
+"""comap.retry module
+
+Retry policy for transient failures, used by both `comap.api` and `comap.api_async`.
+
+- RetryPolicy - when and how long to wait before repeating a failed request
+
+"""
+import random
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+from .constants import (
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    RETRY_MAX_BACKOFF,
+    RETRY_STATUSES,
+)
+
+
+class RetryPolicy:
+    """Retry with exponential backoff and jitter
+
+    Requests that time out, fail to connect or return one of the `retry_statuses`
+    are repeated after a random delay of up to `backoff * 2 ** attempt` seconds.
+    POST requests are repeated only if the call is marked as idempotent.
+    The policy can be shared by multiple `Identity` and `WSV` instances.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_ATTEMPTS,
+        backoff: float = RETRY_BACKOFF,
+        max_backoff: float = RETRY_MAX_BACKOFF,
+        retry_statuses: tuple = RETRY_STATUSES,
+        deadline: float | None = None,
+    ) -> None:
+        """Setup of the retry policy
+
+        Parameters:
+        -----------
+        max_attempts: `int`, optional
+            maximum number of attempts (including the first one)
+        backoff: `float`, optional
+            base delay (in seconds), doubled with each attempt
+        max_backoff: `float`, optional
+            maximum delay between two attempts (in seconds)
+        retry_statuses: `tuple` of `int`, optional
+            HTTP statuses that are retried
+        deadline: `float`, optional
+            no retry is started later than this many seconds after the first attempt
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.deadline = deadline
+        self.retries = Counter()
+
+    def retry_delay(
+        self,
+        api: str,
+        status: int | None,
+        attempt: int,
+        started: float,
+        retry_after: str | None = None,
+    ) -> float | None:
+        """Decide whether to repeat a failed request
+
+        Parameters:
+        -----------
+        api: `str`
+            name of the API (used to count the retries)
+        status: `int` or `None`
+            HTTP status, or `None` if there was no response (timeout, connection error)
+        attempt: `int`
+            number of the failed attempt (starting with 0)
+        started: `float`
+            `time.monotonic()` of the first attempt
+        retry_after: `str`, optional
+            value of the `Retry-After` response header
+
+        Returns:
+        --------
+        delay in seconds before the next attempt, or `None` to give up
+        """
+        if status is not None and status not in self.retry_statuses:
+            return None
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, parse_retry_after(retry_after))
+        if (
+            self.deadline is not None
+            and time.monotonic() + delay - started > self.deadline
+        ):
+            return None
+        self.retries[api] += 1
+        return delay
+
+    @property
+    def total_retries(self) -> int:
+        """Number of retries of all APIs"""
+        return sum(self.retries.values())
+
+
+def parse_retry_after(value: str) -> float:
+    """Convert the Retry-After header (seconds or HTTP date) to seconds"""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
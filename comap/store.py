@@ -0,0 +1,166 @@
+"""comap.store module
+
+Local persistent store of the unit history, used by both `comap.api` and
+`comap.api_async` to download only the history that is not stored yet.
+
+- HistoryStore - SQLite database of the history entries by unit and value GUID
+
+"""
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    unit_guid TEXT NOT NULL,
+    value_guid TEXT NOT NULL,
+    valid_from TEXT NOT NULL,
+    valid_to TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (unit_guid, value_guid, valid_from)
+) WITHOUT ROWID
+"""
+
+
+class HistoryStore:
+    """Local SQLite store of the history
+
+    The timestamps are stored in ISO 8601 format converted to UTC, so their text order
+    is the time order (naive timestamps are taken as UTC). The GUIDs are stored
+    in lowercase, as the API does not keep their case.
+    Entries with the same unit, value and validFrom are replaced, so the same
+    period can be stored multiple times without creating duplicates.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the store
+
+        Parameters:
+        -----------
+        path: `str`
+            SQLite database file (':memory:' for a temporary in-memory store)
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database"""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add_page(self, unit_guid: str, values: list) -> int:
+        """Store one page of history
+
+        Parameters:
+        -----------
+        unit_guid: `str`
+            the genset ID
+        values: `list` of `dict`
+            history page (see `WSV.iter_history`)
+
+        Returns:
+        --------
+        number of stored entries
+        """
+        unit_guid = _guid(unit_guid)
+        rows = [
+            (
+                unit_guid,
+                _guid(value["valueGuid"]),
+                _isoformat(entry["validFrom"]),
+                _isoformat(entry["validTo"]),
+                entry["value"],
+            )
+            for value in values
+            for entry in value["history"]
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def last_valid_to(self, unit_guid: str, value_guid: str) -> datetime | None:
+        """Return the end of the last stored entry, `None` if nothing is stored"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MAX(valid_to) FROM history"
+                " WHERE unit_guid = ? AND value_guid = ?",
+                (_guid(unit_guid), _guid(value_guid)),
+            ).fetchone()
+        return None if row[0] is None else datetime.fromisoformat(row[0])
+
+    def query(
+        self,
+        unit_guid: str,
+        value_guid: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> list:
+        """Return the stored history of a value
+
+        Parameters:
+        -----------
+        unit_guid: `str`
+            the genset ID
+        value_guid: `str`
+            the value ID
+        start: `datetime`, optional
+            return the entries valid after this time
+        end: `datetime`, optional
+            return the entries valid before this time
+
+        Returns:
+        --------
+        `list` of `dict` ordered by validFrom
+        [{
+            'value': `str`,
+            'validFrom': `datetime`,
+            'validTo': `datetime`
+        }]
+        """
+        sql = (
+            "SELECT value, valid_from, valid_to FROM history"
+            " WHERE unit_guid = ? AND value_guid = ?"
+        )
+        parameters = [_guid(unit_guid), _guid(value_guid)]
+        if start is not None:
+            sql += " AND valid_to > ?"
+            parameters.append(_isoformat(start))
+        if end is not None:
+            sql += " AND valid_from < ?"
+            parameters.append(_isoformat(end))
+        with self._lock:
+            rows = self._connection.execute(
+                sql + " ORDER BY valid_from", parameters
+            ).fetchall()
+        return [
+            {
+                "value": value,
+                "validFrom": datetime.fromisoformat(valid_from),
+                "validTo": datetime.fromisoformat(valid_to),
+            }
+            for value, valid_from, valid_to in rows
+        ]
+
+
+def _guid(guid: str) -> str:
+    """Normalize the GUID (the API does not keep the case)"""
+    return guid.strip().lower()
+
+
+def _isoformat(timestamp: datetime | str) -> str:
+    """Normalize the timestamp to ISO 8601 format in UTC, with fixed width
+    (the text comparison in SQLite then orders the timestamps by time)"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc).isoformat(timespec="microseconds")
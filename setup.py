@@ -25,6 +25,11 @@ setuptools.setup(
         'aiofiles',
         'timestring',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'fast': ['orjson'],
+        'models': ['msgspec'],
+    },
     url=PROJECT_URL,
     description=SHORT_DESCRIPTION,
     long_description=LONG,
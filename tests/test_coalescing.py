@@ -0,0 +1,62 @@
+"""Tests of the single-flight coalescing of `comap.api_async.WSV`"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from comap.api_async import WSV
+from comap.mock import MockServer
+
+CALLS = 10
+
+
+def _coalesced(method: str, as_models: bool = False) -> tuple:
+    async def main():
+        async with MockServer(units=3, files=2, latency=0.05) as server:
+            async with aiohttp.ClientSession() as session:
+                wsv = WSV(session, "login", "key", "token")
+                unit_guid = (await wsv.units(coalesce=False))[0]["unitGuid"]
+                server.requests.clear()
+                if method == "units":
+                    calls = [wsv.units(as_models=as_models) for _ in range(CALLS)]
+                elif method == "files":
+                    calls = [
+                        wsv.files(unit_guid, as_models=as_models) for _ in range(CALLS)
+                    ]
+                else:
+                    calls = [wsv.info(unit_guid) for _ in range(CALLS)]
+                return await asyncio.gather(*calls), server.requests[method]
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("as_models", [False, True])
+@pytest.mark.parametrize("method", ["units", "files"])
+def test_concurrent_calls_send_one_request(method, as_models):
+    results, requests = _coalesced(method, as_models)
+    assert requests == 1
+    assert all(result == results[0] for result in results)
+    # each caller gets its own copy
+    assert len({id(result) for result in results}) == CALLS
+    assert len({id(result[0]) for result in results}) == CALLS
+
+
+def test_concurrent_info_calls_send_one_request():
+    results, requests = _coalesced("info")
+    assert requests == 1
+    results[0]["name"] = "changed"
+    results[0]["connection"]["port"] = 0
+    assert results[1]["name"] != "changed"
+    assert results[1]["connection"]["port"] == 23
+
+
+def test_sequential_calls_are_not_coalesced():
+    async def main():
+        async with MockServer(units=3) as server:
+            async with aiohttp.ClientSession() as session:
+                wsv = WSV(session, "login", "key", "token")
+                for _ in range(3):
+                    await wsv.units()
+                return server.requests["units"]
+
+    assert asyncio.run(main()) == 3
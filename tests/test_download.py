@@ -0,0 +1,73 @@
+"""Tests of the resumed downloads of `comap.api` and `comap.api_async`"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from comap import api, api_async
+from comap.api_facade import BackgroundLoop
+from comap.metrics import MetricsCollector
+from comap.mock import MockServer
+
+FILE_SIZE = 100_000
+CONTENT = (bytes(range(256)) * (FILE_SIZE // 256 + 1))[:FILE_SIZE]
+
+
+def _download_sync(part: bytes | None, tmp_path, metrics):
+    server = MockServer(units=1, file_size=FILE_SIZE)
+    with BackgroundLoop() as loop:
+        loop.run(server.start())
+        try:
+            with api.WSV("login", "key", "token", metrics=metrics) as wsv:
+                unit_guid = wsv.units()[0]["unitGuid"]
+                if part is not None:
+                    (tmp_path / "file.ail.part").write_bytes(part)
+                return wsv.download(unit_guid, "file.ail", str(tmp_path), resume=True)
+        finally:
+            loop.run(server.stop())
+
+
+def _download_async(part: bytes | None, tmp_path, metrics):
+    async def main():
+        async with MockServer(units=1, file_size=FILE_SIZE):
+            async with aiohttp.ClientSession() as session:
+                wsv = api_async.WSV(session, "login", "key", "token", metrics=metrics)
+                unit_guid = (await wsv.units())[0]["unitGuid"]
+                if part is not None:
+                    (tmp_path / "file.ail.part").write_bytes(part)
+                return await wsv.download(
+                    unit_guid, "file.ail", str(tmp_path), resume=True
+                )
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(params=[_download_sync, _download_async], ids=["sync", "async"])
+def download(request):
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "part",
+    [None, CONTENT[:30_000], CONTENT, CONTENT + b"changed"],
+    ids=["new", "partial", "complete", "changed"],
+)
+def test_resume(download, part, tmp_path):
+    metrics = MetricsCollector()
+    assert download(part, tmp_path, metrics)
+    assert (tmp_path / "file.ail").read_bytes() == CONTENT
+    assert not (tmp_path / "file.ail.part").exists()
+    downloads = {
+        series["status"]: series
+        for series in metrics.summary()
+        if series["api"] == "download"
+    }
+    if part == CONTENT:
+        # nothing left to download, the .part was renamed
+        assert list(downloads) == ["416"]
+        return
+    if part is not None and len(part) > FILE_SIZE:
+        assert downloads.pop("416")["bytes"] == 0
+    (stats,) = downloads.values()
+    assert stats["bytes"] == FILE_SIZE - (len(part) if part == CONTENT[:30_000] else 0)
+    assert stats["bytes/s"] > 0
@@ -0,0 +1,117 @@
+"""Tests of `comap.api_async.FairScheduler` and `comap.api_async.WSVPool`"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from comap.api_async import FairScheduler, WSVPool
+from comap.mock import MockServer
+
+
+def test_free_slot_goes_to_the_tenant_with_fewest_in_flight():
+    async def main():
+        scheduler = FairScheduler(concurrency=2)
+        await scheduler.acquire("a")
+        await scheduler.acquire("a")
+        granted = []
+
+        async def request(tenant: str) -> None:
+            await scheduler.acquire(tenant)
+            granted.append(tenant)
+
+        tasks = [asyncio.create_task(request("a")) for _ in range(3)]
+        tasks += [asyncio.create_task(request("b")) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.stats() == {
+            "a": {"in_flight": 2, "waiting": 3},
+            "b": {"in_flight": 0, "waiting": 2},
+        }
+        for tenant in ("a", "a", "b", "a", "b"):
+            scheduler.release(tenant, 200)
+            await asyncio.sleep(0)
+        # the tenants take turns while both are waiting
+        assert granted == ["b", "a", "b", "a", "a"]
+        await asyncio.gather(*tasks)
+        assert scheduler.stats() == {"a": {"in_flight": 2, "waiting": 0}}
+        scheduler.release("a", 200)
+        scheduler.release("a", 200)
+        assert scheduler.stats() == {}
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiters_do_not_take_the_slots():
+    async def main():
+        scheduler = FairScheduler(concurrency=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.create_task(scheduler.acquire("b"))
+        granted = asyncio.create_task(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.stats()["b"] == {"in_flight": 0, "waiting": 0}
+        # the slot is passed to 'c', which is cancelled before it runs
+        scheduler.release("a", 200)
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        assert all(stats["in_flight"] == 0 for stats in scheduler.stats().values())
+        await asyncio.wait_for(scheduler.acquire("d"), 1)
+        assert scheduler.stats()["d"] == {"in_flight": 1, "waiting": 0}
+
+    asyncio.run(main())
+
+
+def test_busy_tenant_does_not_starve_the_others():
+    async def main():
+        async with MockServer(units=1, latency=0.05) as server:
+            async with aiohttp.ClientSession() as session:
+                pool = WSVPool(session, concurrency=2)
+                busy = pool.add_tenant("busy", "login-busy", "key", token="token")
+                quiet = pool.add_tenant("quiet", "login-quiet", "key", token="token")
+                unit_guid = server.unit_guid(0)
+                completed = []
+
+                async def values(tenant: str, wsv) -> None:
+                    await wsv.values(unit_guid)
+                    completed.append(tenant)
+
+                tasks = [asyncio.create_task(values("busy", busy)) for _ in range(12)]
+                await asyncio.sleep(0)
+                tasks += [asyncio.create_task(values("quiet", quiet)) for _ in range(2)]
+                await asyncio.gather(*tasks)
+                assert server.max_in_flight["values"] == 2
+                assert pool.stats() == {}
+                return completed
+
+    completed = asyncio.run(main())
+    # FIFO would complete the quiet tenant after all 12 requests of the busy one
+    assert completed[:6].count("quiet") == 2
+
+
+def test_tenants_are_isolated():
+    async def main():
+        async with MockServer(units=1, latency=0.05) as server:
+            async with aiohttp.ClientSession() as session:
+                pool = WSVPool(session)
+                pool.add_tenant("a", "login-a", "key-a", token="token-a")
+                pool.add_tenant("b", "login-b", "key-b", token="token-b")
+                with pytest.raises(ValueError):
+                    pool.add_tenant("a", "login-c", "key-c", token="token-c")
+                unit_guid = server.unit_guid(0)
+                infos = await asyncio.gather(
+                    *(pool[tenant].info(unit_guid) for tenant in ("a", "b", "a", "b"))
+                )
+                # coalesced within each tenant, never across the tenants
+                assert server.requests["info"] == 2
+                assert [info["ownerLoginId"] for info in infos] == [
+                    "login-a",
+                    "login-b",
+                    "login-a",
+                    "login-b",
+                ]
+                units = await pool.units()
+                assert sorted(units) == ["a", "b"]
+                pool.remove_tenant("a")
+                assert pool.tenants == ["b"]
+
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Tests of `comap.api_async.WSV.history_parallel`"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import pytest
+
+from comap.api_async import WSV, ErrorGettingData
+from comap.mock import MockServer
+
+
+def _run(server: MockServer, fail: bool = False, **kwargs):
+    async def main():
+        async with server, aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token", **kwargs.pop("wsv", {}))
+            unit_guid = (await wsv.units())[0]["unitGuid"]
+            value_guids = ",".join(
+                value["valueGuid"] for value in await wsv.values(unit_guid)
+            )
+            if fail:
+                server.error_rate = 1
+            return await wsv.history_parallel(
+                unit_guid, "01/01/2023", "03/01/2023", value_guids, **kwargs
+            )
+
+    return asyncio.run(main())
+
+
+def test_windows_are_merged_without_duplicates_in_order():
+    server = MockServer(units=1, values=3, history_pages=2, history_page_size=50)
+    values = _run(server, window=10, group_size=2)
+    # 6 windows x 2 groups x 2 pages, the mock returns the same entries
+    # for each window, they are merged
+    assert server.requests["history"] == 6 * 2 * 2
+    assert len(values) == 3
+    for value in values:
+        valid_from = [entry["validFrom"] for entry in value["history"]]
+        assert len(valid_from) == 100
+        assert valid_from == sorted(set(valid_from))
+
+
+def test_large_history_is_sorted_in_the_executor():
+    with ThreadPoolExecutor(1) as executor:
+        values = _run(
+            MockServer(units=1, values=2),
+            window=30,
+            wsv={"executor": executor, "offload_size": 1},
+        )
+    assert all(len(value["history"]) == 300 for value in values)
+
+
+def test_failed_window_raises():
+    with pytest.raises(ErrorGettingData):
+        _run(MockServer(units=1), fail=True, window=30)
+
+
+@pytest.mark.parametrize("options", [{"window": 0}, {"concurrency": 0}])
+def test_invalid_options_raise(options):
+    with pytest.raises(ValueError):
+        _run(MockServer(units=1), **options)
@@ -0,0 +1,15 @@
+"""Import time guard - the client modules must not load the HTTP libraries on import"""
+import pytest
+
+from comap.benchmark import _import_times
+
+# limits (in ms) with a wide margin for slow CI machines
+MAX_IMPORT_MS = {"comap": 50, "comap.api": 300, "comap.api_async": 400}
+RUNS = 3
+
+
+@pytest.mark.parametrize("module", sorted(MAX_IMPORT_MS))
+def test_import_time(module):
+    measured = [_import_times(module) for _ in range(RUNS)]
+    assert min(times[module] for times in measured) / 1000 < MAX_IMPORT_MS[module]
+    assert not {"requests", "aiohttp", "aiofiles", "async_timeout"} & set(measured[0])
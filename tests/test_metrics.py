@@ -0,0 +1,49 @@
+"""Tests of the request metrics of `comap.api` and `comap.api_async`"""
+import asyncio
+import os
+
+import aiohttp
+
+from comap import api, api_async
+from comap.api_facade import BackgroundLoop
+from comap.metrics import MetricsCollector
+from comap.mock import MockServer
+
+FILE_SIZE = 300_000
+
+
+def _bytes(metrics: MetricsCollector) -> dict:
+    return {series["api"]: series["bytes"] for series in metrics.summary()}
+
+
+def test_sync_metrics_count_the_bytes_read(tmp_path):
+    server = MockServer(units=1, file_size=FILE_SIZE)
+    with BackgroundLoop() as loop:
+        loop.run(server.start())
+        try:
+            metrics = MetricsCollector()
+            with api.WSV("login", "key", "token", metrics=metrics) as wsv:
+                unit_guid = server.unit_guid(0)
+                assert wsv.values(unit_guid)
+                assert wsv.download(unit_guid, "file.ail", str(tmp_path))
+        finally:
+            loop.run(server.stop())
+    assert os.path.getsize(tmp_path / "file.ail") == FILE_SIZE
+    assert _bytes(metrics)["download"] == FILE_SIZE
+    assert _bytes(metrics)["values"] > 0
+
+
+def test_async_metrics_count_the_bytes_read(tmp_path):
+    async def main():
+        metrics = MetricsCollector()
+        async with MockServer(units=1, file_size=FILE_SIZE) as server:
+            async with aiohttp.ClientSession() as session:
+                wsv = api_async.WSV(session, "login", "key", "token", metrics=metrics)
+                unit_guid = server.unit_guid(0)
+                assert await wsv.values(unit_guid)
+                assert await wsv.download(unit_guid, "file.ail", str(tmp_path))
+        return metrics
+
+    metrics = asyncio.run(main())
+    assert _bytes(metrics)["download"] == FILE_SIZE
+    assert _bytes(metrics)["values"] > 0
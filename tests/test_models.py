@@ -0,0 +1,90 @@
+"""Tests of `comap.models` returned by `comap.api` and `comap.api_async`"""
+import asyncio
+import json
+from datetime import datetime
+
+import aiohttp
+import pytest
+
+from comap import api, api_async, models
+from comap.api_facade import BackgroundLoop
+from comap.mock import MockServer
+from comap.models import FileInfo, HistoryEntry, Unit, Value, ValueHistory
+
+
+def _results_sync(parse_dates: bool) -> dict:
+    server = MockServer(units=2, values=3, files=2, history_pages=2)
+    with BackgroundLoop() as loop:
+        loop.run(server.start())
+        try:
+            with api.WSV("login", "key", "token", parse_dates=parse_dates) as wsv:
+                unit_guid = wsv.units()[0]["unitGuid"]
+                return {
+                    "units": wsv.units(as_models=True),
+                    "values": wsv.values(unit_guid, as_models=True),
+                    "files": wsv.files(unit_guid, as_models=True),
+                    "history": wsv.history(unit_guid, as_models=True),
+                }
+        finally:
+            loop.run(server.stop())
+
+
+def _results_async(parse_dates: bool) -> dict:
+    async def main():
+        async with MockServer(units=2, values=3, files=2, history_pages=2):
+            async with aiohttp.ClientSession() as session:
+                wsv = api_async.WSV(
+                    session, "login", "key", "token", parse_dates=parse_dates
+                )
+                unit_guid = (await wsv.units())[0]["unitGuid"]
+                return {
+                    "units": await wsv.units(as_models=True),
+                    "values": await wsv.values(unit_guid, as_models=True),
+                    "files": await wsv.files(unit_guid, as_models=True),
+                    "history": await wsv.history(unit_guid, as_models=True),
+                }
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    "results", [_results_sync, _results_async], ids=["sync", "async"]
+)
+@pytest.mark.parametrize("parse_dates", [True, False])
+def test_results_as_models(results, parse_dates):
+    result = results(parse_dates)
+    timestamp = datetime if parse_dates else str
+    assert [type(unit) for unit in result["units"]] == [Unit, Unit]
+    assert result["units"][0].unit_guid.startswith("genset")
+    assert len(result["values"]) == 3
+    for value in result["values"]:
+        assert isinstance(value, Value)
+        assert isinstance(value.time_stamp, timestamp)
+    assert [file.file_name for file in result["files"]] == ["file_0.ail", "file_1.ail"]
+    assert all(isinstance(file, FileInfo) for file in result["files"])
+    assert len(result["history"]) == 2
+    for page in result["history"]:
+        assert len(page) == 3
+        for value in page:
+            assert isinstance(value, ValueHistory)
+            assert all(isinstance(entry, HistoryEntry) for entry in value.history)
+            assert isinstance(value.history[0].valid_from, timestamp)
+
+
+@pytest.mark.parametrize("dates", [True, False])
+def test_decoded_as_from_dict(monkeypatch, dates):
+    server = MockServer(values=3, history_pages=2)
+    document = json.dumps(server.history_payload()).encode()
+    decoded = models.decode_models(document, "values", ValueHistory, dates)
+    # the dataclass path, creating the models from the decoded dictionaries
+    monkeypatch.setattr(models, "msgspec", None)
+    created = models.decode_models(document, "values", ValueHistory, dates)
+    assert decoded["nextOffset"] == created["nextOffset"] == 1
+    for value, expected in zip(decoded["values"], created["values"], strict=True):
+        assert value.value_guid == expected.value_guid
+        assert [
+            (entry.value, entry.valid_from, entry.valid_to) for entry in value.history
+        ] == [
+            (entry.value, entry.valid_from, entry.valid_to)
+            for entry in expected.history
+        ]
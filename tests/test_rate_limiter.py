@@ -0,0 +1,37 @@
+"""Regression tests of `comap.api_async.RateLimiter`"""
+import asyncio
+
+import aiohttp
+
+from comap.api_async import WSV, RateLimiter
+from comap.mock import MockServer
+
+
+def test_cancelled_acquire_returns_the_slot():
+    async def main():
+        limiter = RateLimiter(rate=1, burst=1, max_concurrency=4)
+        for _ in range(8):
+            try:
+                await asyncio.wait_for(limiter.acquire(), 0.2)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                limiter.release(200)
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.acquire(), 2)
+        limiter.release(200)
+
+    asyncio.run(main())
+
+
+def test_values_many_timeout_does_not_leak_slots():
+    async def main():
+        async with MockServer(units=6) as server, aiohttp.ClientSession() as session:
+            limiter = RateLimiter(rate=2, burst=1, max_concurrency=3)
+            wsv = WSV(session, "login", "key", "token", rate_limiter=limiter)
+            unit_guids = [server.unit_guid(i) for i in range(6)]
+            await wsv.values_many(unit_guids, timeout=0.6)
+            assert limiter.in_flight == 0
+            assert await asyncio.wait_for(wsv.values(unit_guids[0]), 5)
+
+    asyncio.run(main())
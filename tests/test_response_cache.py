@@ -0,0 +1,75 @@
+"""Tests of `comap.cache.ResponseCache` with `comap.api` and `comap.api_async`"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from comap import api, api_async
+from comap.api_facade import BackgroundLoop
+from comap.cache import ResponseCache
+from comap.mock import MockServer
+
+
+def _units_sync(caches: list, calls: int) -> tuple:
+    """Call `units` with a new `WSV` for each cache (created by the factories)"""
+    server = MockServer(units=2)
+    results = []
+    with BackgroundLoop() as loop:
+        loop.run(server.start())
+        try:
+            for cache in caches:
+                with api.WSV("login", "key", "token", response_cache=cache()) as wsv:
+                    results += [wsv.units() for _ in range(calls)]
+        finally:
+            loop.run(server.stop())
+    return results, server.requests["units"], server.not_modified["units"]
+
+
+def _units_async(caches: list, calls: int) -> tuple:
+    async def main():
+        results = []
+        async with MockServer(units=2) as server:
+            async with aiohttp.ClientSession() as session:
+                for cache in caches:
+                    wsv = api_async.WSV(
+                        session, "login", "key", "token", response_cache=cache()
+                    )
+                    results += [await wsv.units() for _ in range(calls)]
+        return results, server.requests["units"], server.not_modified["units"]
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(params=[_units_sync, _units_async], ids=["sync", "async"])
+def units(request):
+    return request.param
+
+
+def test_not_modified_is_served_from_the_cache(units):
+    cache = ResponseCache()
+    results, requests, not_modified = units([lambda: cache], 3)
+    assert len(results[0]) == 2
+    assert results[1] == results[2] == results[0]
+    # the cached response is validated with each call
+    assert requests == 3
+    assert not_modified == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["not_modified"]) == (2, 1, 2)
+
+
+def test_cache_is_reloaded_from_the_disk(units, tmp_path):
+    caches = []
+
+    def cache() -> ResponseCache:
+        caches.append(ResponseCache(path=str(tmp_path)))
+        if len(caches) == 2:
+            assert caches[1].stats()["disk_entries"] == 1
+            assert caches[1].stats()["entries"] == 0
+        return caches[-1]
+
+    (first, second), requests, not_modified = units([cache, cache], 1)
+    assert second == first
+    # the second cache validates the response read from the disk
+    assert (requests, not_modified) == (2, 1)
+    assert caches[1].stats()["not_modified"] == 1
+    assert caches[1].stats()["misses"] == 0
@@ -0,0 +1,102 @@
+"""Tests of `comap.retry.RetryPolicy` with `comap.api` and `comap.api_async`"""
+import asyncio
+import time
+from email.utils import formatdate
+
+import aiohttp
+import pytest
+
+from comap import api, api_async
+from comap.api_facade import BackgroundLoop
+from comap.mock import MockServer
+from comap.retry import RetryPolicy, parse_retry_after
+
+RETRY_AFTER = 0.2
+
+
+def _throttled_sync(policy: RetryPolicy) -> tuple:
+    server = MockServer(units=1, throttle_rate=1, retry_after=RETRY_AFTER)
+    with BackgroundLoop() as loop:
+        loop.run(server.start())
+        try:
+            with api.WSV("login", "key", "token", retry_policy=policy) as wsv:
+                return wsv.units(), server.requests["units"]
+        finally:
+            loop.run(server.stop())
+
+
+def _throttled_async(policy: RetryPolicy) -> tuple:
+    async def main():
+        async with MockServer(
+            units=1, throttle_rate=1, retry_after=RETRY_AFTER
+        ) as server:
+            async with aiohttp.ClientSession() as session:
+                wsv = api_async.WSV(
+                    session, "login", "key", "token", retry_policy=policy
+                )
+                return await wsv.units(), server.requests["units"]
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    "throttled", [_throttled_sync, _throttled_async], ids=["sync", "async"]
+)
+def test_retry_after_is_respected(throttled):
+    policy = RetryPolicy(max_attempts=3, backoff=0.01)
+    started = time.monotonic()
+    units, requests = throttled(policy)
+    assert units == []
+    assert requests == 3
+    assert policy.retries["units"] == 2
+    assert time.monotonic() - started >= 2 * RETRY_AFTER
+
+
+@pytest.mark.parametrize(
+    "throttled", [_throttled_sync, _throttled_async], ids=["sync", "async"]
+)
+def test_deadline_stops_the_retries(throttled):
+    policy = RetryPolicy(max_attempts=10, backoff=0.01, deadline=RETRY_AFTER / 2)
+    units, requests = throttled(policy)
+    assert units == []
+    assert requests == 1
+    assert policy.total_retries == 0
+
+
+def test_transient_errors_are_retried():
+    async def main():
+        policy = RetryPolicy(max_attempts=10, backoff=0.05)
+        async with MockServer(units=2, error_rate=1) as server:
+            async with aiohttp.ClientSession() as session:
+                wsv = api_async.WSV(
+                    session, "login", "key", "token", retry_policy=policy
+                )
+                asyncio.get_running_loop().call_later(
+                    0.1, setattr, server, "error_rate", 0
+                )
+                units = await wsv.units()
+                return units, server.requests["units"], policy.retries["units"]
+
+    units, requests, retries = asyncio.run(main())
+    assert len(units) == 2
+    assert retries >= 1
+    assert requests == retries + 1
+
+
+def test_other_errors_are_not_retried():
+    policy = RetryPolicy()
+    assert policy.retry_delay("units", 404, 0, time.monotonic()) is None
+    assert policy.retry_delay("units", 503, 0, time.monotonic()) is not None
+    assert policy.retry_delay("units", None, 0, time.monotonic()) is not None
+    assert (
+        policy.retry_delay("units", 503, policy.max_attempts - 1, time.monotonic())
+        is None
+    )
+    assert policy.retries["units"] == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after("soon") == 0
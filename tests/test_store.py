@@ -0,0 +1,69 @@
+"""Tests of `comap.store.HistoryStore`"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+from comap.api_async import WSV
+from comap.mock import MockServer
+from comap.store import HistoryStore
+
+
+def _page(*entries):
+    return [
+        {
+            "valueGuid": "value",
+            "history": [
+                {"value": str(i), "validFrom": valid_from, "validTo": valid_to}
+                for i, (valid_from, valid_to) in enumerate(entries)
+            ],
+        }
+    ]
+
+
+def test_mixed_offsets_are_ordered_by_time():
+    with HistoryStore(":memory:") as store:
+        store.add_page(
+            "unit",
+            _page(
+                ("2023-10-29T02:00:00+02:00", "2023-10-29T02:30:00+02:00"),
+                ("2023-10-29T02:00:00+01:00", "2023-10-29T02:10:00+01:00"),
+            ),
+        )
+        last = store.last_valid_to("unit", "value")
+        assert last == datetime(2023, 10, 29, 1, 10, tzinfo=timezone.utc)
+        start = datetime(2023, 10, 29, 2, 5, tzinfo=timezone(timedelta(hours=1)))
+        assert [entry["value"] for entry in store.query("unit", "value", start)] == [
+            "1"
+        ]
+
+
+def test_naive_timestamps_are_utc():
+    with HistoryStore(":memory:") as store:
+        store.add_page("unit", _page(("2023-01-01T00:00:00", "2023-01-01T00:00:00.5")))
+        (entry,) = store.query("unit", "value", end=datetime(2023, 1, 1, 0, 0, 1))
+        assert entry["validTo"] == datetime(
+            2023, 1, 1, 0, 0, 0, 500000, tzinfo=timezone.utc
+        )
+
+
+def test_sync_history_requests_only_the_gap():
+    async def main():
+        async with MockServer(units=1) as server, aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            unit_guid = (await wsv.units())[0]["unitGuid"]
+            # a different case and spaces than the GUIDs returned by the API
+            value_guids = " 7B2AE258-65A8-40DD-BB42-5455753679F9 , 6253525d-cf01-4a15-a34b-6c232496e7b4"
+            with HistoryStore(":memory:") as store:
+                first = await wsv.sync_history(
+                    store, unit_guid, value_guids, _from="01/01/2022"
+                )
+                second = await wsv.sync_history(store, unit_guid, value_guids)
+                assert first == second > 0
+                assert store.query(unit_guid, value_guids.split(",")[0])
+        return server.history_queries
+
+    queries = asyncio.run(main())
+    assert queries[0]["from"] == "01/01/2022"
+    # the last stored entry ends on 01/01/2023, the day before is requested
+    assert {query["from"] for query in queries[len(queries) // 2 :]} == {"12/31/2022"}
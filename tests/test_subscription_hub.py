@@ -0,0 +1,146 @@
+"""Tests of `comap.api_async.SubscriptionHub`"""
+import asyncio
+
+import aiohttp
+import pytest
+
+from comap.api_async import WSV, SubscriptionHub
+from comap.mock import MockServer
+
+
+async def _first_unit(wsv: WSV) -> str:
+    return (await wsv.units())[0]["unitGuid"]
+
+
+def test_unread_subscription_does_not_block_the_others():
+    async def main():
+        async with MockServer(units=1), aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            hub = SubscriptionHub(wsv, interval=0.05, queue_size=1)
+            unit_guid = await _first_unit(wsv)
+            alarms = hub.subscribe(unit_guid)
+            billing = hub.subscribe(unit_guid)
+            task = asyncio.create_task(hub.run())
+            received = 0
+            try:
+                async with asyncio.timeout(1):
+                    async for _ in alarms:
+                        received += 1
+            except TimeoutError:
+                pass
+            task.cancel()
+            assert received >= 10
+            assert billing.dropped >= 9
+
+    asyncio.run(main())
+
+
+def test_iteration_ends_after_close():
+    async def main():
+        async with MockServer(units=1), aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            hub = SubscriptionHub(wsv)
+            subscription = hub.subscribe(await _first_unit(wsv))
+            waiting = asyncio.create_task(subscription.get())
+            await asyncio.sleep(0)
+            subscription.close()
+            assert [values async for values in subscription] == []
+            (result,) = await asyncio.gather(waiting, return_exceptions=True)
+            assert isinstance(result, StopAsyncIteration)
+            assert hub.requests() == {}
+
+    asyncio.run(main())
+
+
+def test_value_guids_are_not_case_sensitive():
+    async def main():
+        async with MockServer(units=1) as server, aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            unit_guid = await _first_unit(wsv)
+            value_guids = [value["valueGuid"] for value in await wsv.values(unit_guid)]
+            hub = SubscriptionHub(wsv)
+            upper = hub.subscribe(unit_guid, f" {value_guids[0].upper()}")
+            lower = hub.subscribe(
+                unit_guid, f"{value_guids[0].lower()},{value_guids[1]}"
+            )
+            assert hub.requests() == {
+                unit_guid: ",".join(
+                    sorted({value_guids[0].lower(), value_guids[1].lower()})
+                )
+            }
+            await hub.poll()
+            assert [value["valueGuid"] for value in await upper.get()] == value_guids[
+                :1
+            ]
+            assert [value["valueGuid"] for value in await lower.get()] == value_guids[
+                :2
+            ]
+            assert server.requests["values"] == 2
+
+    asyncio.run(main())
+
+
+def test_poll_limits_the_concurrent_requests():
+    async def main():
+        async with MockServer(
+            units=8, latency=0.05
+        ) as server, aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            hub = SubscriptionHub(wsv, concurrency=2)
+            subscriptions = [
+                hub.subscribe(unit["unitGuid"]) for unit in await wsv.units()
+            ]
+            await hub.poll()
+            assert server.requests["values"] == 8
+            assert server.max_in_flight["values"] == 2
+            for subscription in subscriptions:
+                assert len(await subscription.get()) > 0
+
+    asyncio.run(main())
+
+
+def test_overflow_policies():
+    async def main():
+        async with MockServer(units=1), aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            hub = SubscriptionHub(wsv, queue_size=1)
+            unit_guid = await _first_unit(wsv)
+            oldest = hub.subscribe(unit_guid)
+            newest = hub.subscribe(unit_guid, overflow="drop_newest")
+            for _ in range(3):
+                await hub.poll()
+            assert oldest.dropped == 2
+            assert newest.dropped == 2
+            assert await oldest.get() != await newest.get()
+
+    asyncio.run(main())
+
+
+def test_blocked_subscription_is_left_out_of_the_polls():
+    async def main():
+        async with MockServer(units=1) as server, aiohttp.ClientSession() as session:
+            wsv = WSV(session, "login", "key", "token")
+            hub = SubscriptionHub(wsv, queue_size=1, overflow="block")
+            unit_guid = await _first_unit(wsv)
+            subscription = hub.subscribe(unit_guid)
+            await hub.poll()
+            await hub.poll()
+            # the second poll waits for the space in the queue
+            assert not subscription.ready
+            assert hub.requests() == {}
+            await hub.poll()
+            assert server.requests["values"] == 2
+            first = await subscription.get()
+            await asyncio.sleep(0)
+            assert subscription.ready
+            assert await subscription.get() != first
+            assert subscription.dropped == 0
+            subscription.close()
+            assert hub.requests() == {}
+
+    asyncio.run(main())
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        SubscriptionHub(None, overflow="drop_all")
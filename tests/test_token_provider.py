@@ -0,0 +1,78 @@
+"""Tests of the background refresh of `comap.api_async.TokenProvider`"""
+import asyncio
+import gc
+import logging
+
+import aiohttp
+
+from comap.api_async import Identity, TokenProvider
+from comap.mock import MockServer
+
+BACKOFF = 0.2
+
+
+def test_failed_background_refresh_waits_for_the_backoff():
+    async def main():
+        async with MockServer() as server, aiohttp.ClientSession() as session:
+            identity = Identity(session, "key")
+            # the mock token expires in 3599 s, so it is always refreshed in the background
+            provider = TokenProvider(
+                identity,
+                "client",
+                "secret",
+                refresh_margin=3600,
+                refresh_backoff=BACKOFF,
+            )
+            token = await provider.token()
+            server.error_rate = 1
+            assert await provider.token() == token
+            await asyncio.sleep(0.05)
+            for _ in range(5):
+                assert await provider.token() == token
+            await asyncio.sleep(0.05)
+            assert server.requests["authenticate"] == 2
+            server.error_rate = 0
+            await asyncio.sleep(BACKOFF)
+            assert await provider.token() == token
+            await asyncio.sleep(0.05)
+            assert server.requests["authenticate"] == 3
+            assert await provider.token() != token
+
+    asyncio.run(main())
+
+
+class FailingIdentity:
+    """Identity whose authentication raises after the first token"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def authenticate(self, client_id: str, secret: str) -> dict:
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("Identity API unavailable")
+        return {"access_token": "token", "expires_in": 3599}
+
+
+def test_background_refresh_error_is_logged(caplog):
+    unhandled = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        identity = FailingIdentity()
+        provider = TokenProvider(
+            identity, "client", "secret", refresh_margin=3600, refresh_backoff=BACKOFF
+        )
+        assert await provider.token() == "token"
+        for _ in range(3):
+            assert await provider.token() == "token"
+            await asyncio.sleep(0.01)
+        gc.collect()
+        return identity.calls
+
+    with caplog.at_level(logging.ERROR, logger="comap.api_async"):
+        calls = asyncio.run(main())
+    assert calls == 2
+    assert "Identity API unavailable" in caplog.text
+    assert unhandled == []